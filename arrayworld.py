@@ -0,0 +1,650 @@
+import concurrent.futures
+import math
+import numpy as np
+import config
+import organism
+from placement import Placer
+
+
+# Organism types in the order of their species codes
+SPECIES = (organism.Plant, organism.Herbivore, organism.Carnivore)
+PLANT, HERBIVORE, CARNIVORE = range(len(SPECIES))
+
+# The species that each species eats, or NO_SPECIES if it doesn't eat
+NO_SPECIES = -1
+PREY_SPECIES = (NO_SPECIES, PLANT, HERBIVORE)
+
+# Value of the prey column for an Animal that isn't chasing anything
+NO_PREY = -1
+
+# PREY_SPECIES as an array, to look up many species at once
+PREY_SPECIES_ARRAY = np.array(PREY_SPECIES)
+
+# The species whose meals are settled first when feeding is batched:  predators
+# before their prey, so an Animal that is eaten doesn't get to eat
+FEEDING_ORDER = (CARNIVORE, HERBIVORE)
+
+# The per-organism state, one array per attribute.  Rows [0, count) are in use.
+COLUMNS = (('x', np.int32),
+        ('y', np.int32),
+        ('species', np.int8),
+        ('isAlive', np.bool_),
+        ('age', np.int32),
+        ('lastReproductionAge', np.int32),
+        ('timeSinceLastEaten', np.int32),
+        ('destinationX', np.int32),
+        ('destinationY', np.int32),
+        ('prey', np.int32))
+
+# Returns an array holding the given constant from settings (the config module
+# or a copy of it) for each species.  Species that don't have the constant (e.g.
+# Plants have no SPEED) get default.
+def speciesConstants(settings, name, default=0):
+    return np.array([getattr(getattr(settings, organismType.__name__), name, default)
+            for organismType in SPECIES])
+
+
+# Buckets organisms into a uniform grid of cells so that proximity queries only
+# look at nearby organisms.  Unlike World's grids this is rebuilt from the position
+# arrays in one vectorized pass rather than updated as organisms move.
+class CellIndex:
+    def __init__(self, x, y, cellSize, worldSize):
+        self.cellSize = cellSize
+        self.numColumns = worldSize[0] // cellSize + 1
+        self.numRows = worldSize[1] // cellSize + 1
+        keys = (x // cellSize).astype(np.int64) * self.numRows + y // cellSize
+        # Organism indices sorted by cell.  The organisms in cell k are
+        # order[cellStart[k]:cellStart[k + 1]].
+        self.order = np.argsort(keys, kind='stable')
+        self.cellStart = np.zeros(self.numColumns * self.numRows + 1, np.int64)
+        np.cumsum(np.bincount(keys, minlength=self.numColumns * self.numRows),
+                out=self.cellStart[1:])
+
+    # Returns the indices of the organisms in the cells overlapping the square
+    # that bounds the circle with the given center and radius.  Callers still
+    # have to check the actual distance.
+    def query(self, x, y, radius):
+        cellSize = self.cellSize
+        minColumn = max(0, int((x - radius) // cellSize))
+        maxColumn = min(self.numColumns - 1, int((x + radius) // cellSize))
+        minRow = max(0, int((y - radius) // cellSize))
+        maxRow = min(self.numRows - 1, int((y + radius) // cellSize))
+        if minColumn > maxColumn or minRow > maxRow:
+            return self.order[:0]
+        # The cells of a column are contiguous in the sorted order, so each column
+        # of the query box is a single slice.
+        cellStart = self.cellStart
+        numRows = self.numRows
+        return np.concatenate([self.order[cellStart[column * numRows + minRow]:cellStart[column * numRows + maxRow + 1]]
+                for column in range(minColumn, maxColumn + 1)])
+
+    # query for many centers at once.  Returns (queries, candidates):  for each
+    # i, organism candidates[i] is in a cell near center queries[i].  The cells
+    # searched for each center cover the square that bounds the circle of radius
+    # around it, so callers still have to check the actual distances.
+    def queryMany(self, x, y, radius):
+        cellSize = self.cellSize
+        numRows = self.numRows
+        reach = int(math.ceil(radius / cellSize))
+        column = np.asarray(x, np.int64) // cellSize
+        row = np.asarray(y, np.int64) // cellSize
+        minRow = np.maximum(0, row - reach)
+        maxRow = np.minimum(numRows - 1, row + reach)
+        # One slice of the sorted order per center and column, as in query
+        columns = column[:, np.newaxis] + np.arange(-reach, reach + 1)
+        valid = (columns >= 0) & (columns < self.numColumns) & (minRow <= maxRow)[:, np.newaxis]
+        columns = np.where(valid, columns, 0)
+        starts = self.cellStart[columns * numRows + minRow[:, np.newaxis]]
+        ends = self.cellStart[columns * numRows + maxRow[:, np.newaxis] + 1]
+        lengths = np.where(valid, ends - starts, 0).ravel()
+        starts = starts.ravel()
+        queries = np.repeat(np.repeat(np.arange(len(column)), 2 * reach + 1), lengths)
+        # Position of each pair within its slice, added to the slice's start
+        sliceOffsets = np.cumsum(lengths) - lengths
+        positions = np.arange(int(lengths.sum())) - np.repeat(sliceOffsets - starts, lengths)
+        return queries, self.order[positions]
+
+
+# An alternative to World that stores the state of every organism in
+# NumPy arrays (structure of arrays) and advances the whole population with
+# vectorized operations each tick.  It follows the same rules as the Organism
+# classes:  a tick ages everything, lets organisms reproduce with probability
+# (time since last reproduction) / MAX_TIME_BETWEEN_REPRODUCTION, moves Animals
+# toward their destinations, lets hungry Animals eat or pick prey, starves
+# Animals that haven't eaten for TIME_TO_STARVATION and picks new destinations
+# for Animals that have arrived.
+#
+# By default Animals feed one at a time and children are placed one at a time,
+# each seeing the effects of the ones before, as in World.  With batched, a tick
+# does each in two phases instead.  First every hungry Animal proposes the prey
+# it would eat or chase (and every parent a spot for its child) from a read-only
+# view of the world.  The proposals are then settled all at once with sorts:
+# each prey goes to the closest Animal proposing to eat it (ties to the lowest
+# index), Carnivores eat before Herbivores so an eaten Herbivore doesn't eat,
+# and a child is only placed if it doesn't overlap anything, a child placed by
+# an earlier attempt or a lower-indexed child proposed in the same attempt.  An
+# Animal that loses its meal goes hungry for the tick, and one whose chase
+# target was eaten looks again next tick.  The proposals don't depend on each
+# other, so with threads > 1 they are computed in chunks on that many threads;
+# the results are the same for any number of threads.
+class ArrayWorld:
+    # The per-organism state, in the form of COLUMNS
+    columns = COLUMNS
+
+    # settings is the config module or a copy of it made by config.copy()
+    def __init__(self, seed=None, capacity=1024, settings=config, batched=False, threads=1):
+        self.config = settings
+        self.batched = batched
+        self.threads = threads
+        # Created the first time proposals are computed on more than one thread
+        self.executor = None
+        self.rng = np.random.default_rng(seed)
+        self.worldSize = settings.WORLD_SIZE
+
+        self.size = speciesConstants(settings, 'SIZE')
+        self.speed = speciesConstants(settings, 'SPEED')
+        self.timeToHunger = speciesConstants(settings, 'TIME_TO_HUNGER')
+        self.timeToStarvation = speciesConstants(settings, 'TIME_TO_STARVATION')
+        self.sightRadius = speciesConstants(settings, 'SIGHT_RADIUS')
+        self.maxEatRadius = speciesConstants(settings, 'MAX_EAT_RADIUS')
+        self.maxTimeBetweenReproduction = speciesConstants(settings, 'MAX_TIME_BETWEEN_REPRODUCTION')
+        self.reproductionRadius = speciesConstants(settings, 'REPRODUCTION_RADIUS')
+        self.maxAttemptsToReproduce = speciesConstants(settings, 'MAX_ATTEMPTS_TO_REPRODUCE')
+        self.maxSize = int(self.size.max())
+        # Same cell size as World.gridCellSize
+        self.cellSize = int(math.ceil(max(self.sightRadius.max() / 2.0, 2 * self.maxSize)))
+
+        self.count = 0
+        for name, dtype in self.columns:
+            setattr(self, name, np.zeros(capacity, dtype))
+        # Number of living organisms of each species as of the end of the last turn
+        self.populations = np.zeros(len(SPECIES), np.int64)
+        # Running totals for telemetry:  the number of each species born (not
+        # spawned), and the number that have died of each cause
+        self.births = np.zeros(len(SPECIES), np.int64)
+        self.deaths = {cause: np.zeros(len(SPECIES), np.int64)
+                for cause in (organism.STARVATION, organism.PREDATION)}
+
+    # Reseed the world's random number generator
+    def seed(self, value):
+        self.rng = np.random.default_rng(value)
+
+    # Returns the state of the world's random number generator as a dict of
+    # plain numbers that can be serialized (e.g. with json) and passed to
+    # setRandomState.
+    def getRandomState(self):
+        return self.rng.bit_generator.state
+
+    def setRandomState(self, state):
+        self.rng.bit_generator.state = state
+
+    # Make sure there is room for at least capacity organisms
+    def reserve(self, capacity):
+        oldCapacity = len(self.x)
+        if capacity <= oldCapacity:
+            return
+        newCapacity = max(capacity, 2 * oldCapacity)
+        for name, dtype in self.columns:
+            column = np.zeros(newCapacity, dtype)
+            column[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, column)
+
+    # Returns the species code for an Organism class such as organism.Plant
+    def speciesOf(self, organismType):
+        return SPECIES.index(organismType)
+
+    # Returns the number of living organisms of the given type in the world
+    def countOrganisms(self, organismType):
+        return int(sum(self.populations[species] for species, speciesType in enumerate(SPECIES)
+                if issubclass(speciesType, organismType)))
+
+    # Returns the number of organisms of the given type born since the world was
+    # created
+    def countBirths(self, organismType):
+        return int(sum(self.births[species] for species, speciesType in enumerate(SPECIES)
+                if issubclass(speciesType, organismType)))
+
+    # Returns the number of organisms of the given type that have died of cause
+    # since the world was created
+    def countDeaths(self, organismType, cause):
+        return int(sum(self.deaths[cause][species] for species, speciesType in enumerate(SPECIES)
+                if issubclass(speciesType, organismType)))
+
+    # Returns how close the living Animals of the given type are to starving on
+    # average, from 0 (all just ate) to 1 (all about to starve), or None if there
+    # aren't any
+    def meanHunger(self, organismType):
+        count = self.count
+        species = self.species[:count]
+        selected = np.isin(species, [code for code, speciesType in enumerate(SPECIES)
+                if issubclass(speciesType, organismType)]) & self.isAlive[:count]
+        if not selected.any():
+            return None
+        return float(np.mean(self.timeSinceLastEaten[:count][selected]
+                / self.timeToStarvation[species[selected]]))
+
+    # Return random locations (uniformly distributed) in the world, as x and y arrays
+    def randomLocations(self, number):
+        return (self.rng.integers(0, self.worldSize[0], number, endpoint=True),
+                self.rng.integers(0, self.worldSize[1], number, endpoint=True))
+
+    # Append newborn organisms at the given locations.  species is either a
+    # single species code or one per organism.
+    def addOrganisms(self, species, x, y):
+        number = len(x)
+        start = self.count
+        self.reserve(start + number)
+        end = start + number
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.species[start:end] = species
+        self.isAlive[start:end] = True
+        self.age[start:end] = 0
+        self.lastReproductionAge[start:end] = 0
+        self.timeSinceLastEaten[start:end] = 0
+        self.prey[start:end] = NO_PREY
+        # Plants never get a destination, so clear whatever a dead organism left
+        self.destinationX[start:end] = 0
+        self.destinationY[start:end] = 0
+        self.count = end
+        self.populations += np.bincount(self.species[start:end], minlength=len(SPECIES))
+        animals = np.flatnonzero(self.species[start:end] != PLANT) + start
+        self.pickNewDestinations(animals)
+
+    def pickNewDestinations(self, indices):
+        self.destinationX[indices], self.destinationY[indices] = self.randomLocations(len(indices))
+
+    # Returns true if there is room for an organism of the given size at (x, y).
+    # newborns maps grid cells to the (x, y, size) of organisms placed since
+    # cellIndex was built.
+    def canFit(self, cellIndex, newborns, x, y, size):
+        nearby = cellIndex.query(x, y, size + self.maxSize)
+        deltaX = self.x[nearby] - x
+        deltaY = self.y[nearby] - y
+        minDistance = size + self.size[self.species[nearby]]
+        if np.any(deltaX * deltaX + deltaY * deltaY < minDistance * minDistance):
+            return False
+        cellSize = self.cellSize
+        column, row = x // cellSize, y // cellSize
+        for neighborColumn in range(column - 1, column + 2):
+            for neighborRow in range(row - 1, row + 2):
+                for otherX, otherY, otherSize in newborns.get((neighborColumn, neighborRow), ()):
+                    if (otherX - x) ** 2 + (otherY - y) ** 2 < (size + otherSize) ** 2:
+                        return False
+        return True
+
+    # Returns how far the closest organism is from overlapping an organism of the
+    # given size at (x, y):  negative if it would overlap, at least 0 if it fits.
+    # cellIndex and newborns are as for canFit.
+    def clearance(self, cellIndex, newborns, x, y, size):
+        nearby = cellIndex.query(x, y, size + self.maxSize)
+        clearance = float("inf")
+        if len(nearby) > 0:
+            clearance = float(np.min(np.hypot(self.x[nearby] - x, self.y[nearby] - y)
+                    - (size + self.size[self.species[nearby]])))
+        cellSize = self.cellSize
+        column, row = x // cellSize, y // cellSize
+        for neighborColumn in range(column - 1, column + 2):
+            for neighborRow in range(row - 1, row + 2):
+                for otherX, otherY, otherSize in newborns.get((neighborColumn, neighborRow), ()):
+                    clearance = min(clearance, math.hypot(otherX - x, otherY - y) - (size + otherSize))
+        return clearance
+
+    # Spawn up to numberToSpawn organisms of organismType at random free
+    # locations.  Returns the number actually spawned, which is less than
+    # numberToSpawn if the world ran out of room.
+    def spawnOrganisms(self, organismType, numberToSpawn, createWithSpawnRing):
+        species = self.speciesOf(organismType)
+        size = int(self.size[species])
+        cellIndex = CellIndex(self.x[:self.count], self.y[:self.count], self.cellSize, self.worldSize)
+        newborns = {}
+        placer = Placer(self.worldSize, size,
+                lambda x, y: self.clearance(cellIndex, newborns, x, y, size),
+                lambda: (int(self.rng.integers(0, self.worldSize[0], endpoint=True)),
+                        int(self.rng.integers(0, self.worldSize[1], endpoint=True))),
+                self.rng.shuffle)
+        spawnedX = []
+        spawnedY = []
+        while len(spawnedX) < numberToSpawn:
+            location = placer.findLocation()
+            if location is None:
+                break
+            x, y = location
+            newborns.setdefault((x // self.cellSize, y // self.cellSize), []).append((x, y, size))
+            spawnedX.append(x)
+            spawnedY.append(y)
+        self.addOrganisms(species, spawnedX, spawnedY)
+        return len(spawnedX)
+
+    # Returns the indices of the organisms that reproduce this turn, which
+    # reproduce with probability (time since last reproduction) /
+    # MAX_TIME_BETWEEN_REPRODUCTION, and resets their time since reproducing
+    def chooseParents(self):
+        count = self.count
+        species = self.species[:count]
+        timeSinceLastReproduction = self.age[:count] - self.lastReproductionAge[:count]
+        probabilityOfReproduction = np.minimum(1.0,
+                timeSinceLastReproduction / self.maxTimeBetweenReproduction[species])
+        parents = np.flatnonzero(self.rng.random(count) < probabilityOfReproduction)
+        self.lastReproductionAge[parents] = self.age[parents]
+        return parents
+
+    # Returns the x and y arrays of a random spot for the child of each of
+    # parents, on the circle of REPRODUCTION_RADIUS around it (the same placement
+    # as World.randomLocationInCircle)
+    def childLocations(self, parents):
+        orientation = self.rng.uniform(0, 2.0 * math.pi, len(parents))
+        radius = self.reproductionRadius[self.species[parents]]
+        return (np.clip((self.x[parents] + radius * np.sin(orientation)).astype(np.int64), 0, self.worldSize[0]),
+                np.clip((self.y[parents] + radius * np.cos(orientation)).astype(np.int64), 0, self.worldSize[1]))
+
+    # Let every organism that should reproduce this turn try to place a child
+    # at a random spot on the circle of REPRODUCTION_RADIUS around it.
+    def reproduce(self):
+        count = self.count
+        parents = self.chooseParents()
+        if len(parents) == 0:
+            return
+
+        cellIndex = CellIndex(self.x[:count], self.y[:count], self.cellSize, self.worldSize)
+        newborns = {}
+        childSpecies = []
+        childrenX = []
+        childrenY = []
+        for attempt in range(int(self.maxAttemptsToReproduce.max())):
+            parents = parents[self.maxAttemptsToReproduce[self.species[parents]] > attempt]
+            if len(parents) == 0:
+                break
+            candidatesX, candidatesY = self.childLocations(parents)
+            if self.batched:
+                placed = self.settleChildren(cellIndex, parents, candidatesX, candidatesY,
+                        childSpecies, childrenX, childrenY)
+                parents = parents[~placed]
+                continue
+            placed = np.zeros(len(parents), np.bool_)
+            for i, (parent, x, y) in enumerate(zip(parents.tolist(), candidatesX.tolist(), candidatesY.tolist())):
+                parentSpecies = int(self.species[parent])
+                size = int(self.size[parentSpecies])
+                if self.canFit(cellIndex, newborns, x, y, size):
+                    newborns.setdefault((x // self.cellSize, y // self.cellSize), []).append((x, y, size))
+                    childSpecies.append(parentSpecies)
+                    childrenX.append(x)
+                    childrenY.append(y)
+                    placed[i] = True
+            parents = parents[~placed]
+
+        if childSpecies:
+            self.addOrganisms(childSpecies, childrenX, childrenY)
+            self.births += np.bincount(childSpecies, minlength=len(SPECIES))
+
+    # Returns a mask of which of the circles with centers (x, y) and radii size
+    # overlap any of the circles indexed by cellIndex, whose centers and radii
+    # are otherX, otherY and otherSize.  With earlierOnly the two sets of circles
+    # are the same, and each is only checked against the ones before it.
+    def overlaps(self, cellIndex, otherX, otherY, otherSize, x, y, size, earlierOnly=False):
+        blocked = np.zeros(len(x), np.bool_)
+        if len(x) == 0:
+            return blocked
+        queries, others = cellIndex.queryMany(x, y, int(size.max()) + self.maxSize)
+        if earlierOnly:
+            before = others < queries
+            queries = queries[before]
+            others = others[before]
+        deltaX = np.asarray(otherX, np.int64)[others] - np.asarray(x, np.int64)[queries]
+        deltaY = np.asarray(otherY, np.int64)[others] - np.asarray(y, np.int64)[queries]
+        reach = size[queries] + otherSize[others]
+        blocked[queries[deltaX * deltaX + deltaY * deltaY < reach * reach]] = True
+        return blocked
+
+    # Settle one attempt of batched reproduction, in which the child of each of
+    # parents would go at (candidatesX, candidatesY).  childSpecies, childrenX and
+    # childrenY hold the children placed by earlier attempts, and the children
+    # placed by this one are added to them.  Returns a mask of the parents whose
+    # child was placed.
+    def settleChildren(self, cellIndex, parents, candidatesX, candidatesY, childSpecies, childrenX, childrenY):
+        count = self.count
+        species = self.species[parents]
+        size = self.size[species]
+        blocked = self.overlaps(cellIndex, self.x[:count], self.y[:count], self.size[self.species[:count]],
+                candidatesX, candidatesY, size)
+        if childSpecies:
+            earlierX = np.array(childrenX, np.int64)
+            earlierY = np.array(childrenY, np.int64)
+            earlierIndex = CellIndex(earlierX, earlierY, self.cellSize, self.worldSize)
+            blocked |= self.overlaps(earlierIndex, earlierX, earlierY, self.size[np.array(childSpecies)],
+                    candidatesX, candidatesY, size)
+        candidateIndex = CellIndex(candidatesX, candidatesY, self.cellSize, self.worldSize)
+        blocked |= self.overlaps(candidateIndex, candidatesX, candidatesY, size,
+                candidatesX, candidatesY, size, earlierOnly=True)
+        placed = ~blocked
+        childSpecies.extend(species[placed].tolist())
+        childrenX.extend(candidatesX[placed].tolist())
+        childrenY.extend(candidatesY[placed].tolist())
+        return placed
+
+    # Take one step for every Animal in the direction of its destination.
+    # Carnivores first retarget onto the current location of their prey.
+    def moveAnimals(self, animals):
+        self.retargetChasers(animals)
+        self.stepAnimals(animals)
+
+    # Point every Carnivore that is chasing prey at its prey's current location
+    def retargetChasers(self, animals):
+        prey = self.prey[animals]
+        chasers = animals[(prey != NO_PREY) & (self.species[animals] == CARNIVORE)]
+        self.destinationX[chasers] = self.x[self.prey[chasers]]
+        self.destinationY[chasers] = self.y[self.prey[chasers]]
+
+    # Move each of animals one step toward its destination:  speed along each
+    # axis, or the rest of the way once it's within speed, as Animal.steer does
+    def stepAnimals(self, animals):
+        speed = self.speed[self.species[animals]]
+        for location, destination in ((self.x, self.destinationX), (self.y, self.destinationY)):
+            current = location[animals]
+            location[animals] = current + np.minimum(np.maximum(destination[animals] - current, -speed), speed)
+        self.timeSinceLastEaten[animals] += 1
+
+    # Returns the index of the closest living organism of the given species
+    # within radius of (x, y), or NO_PREY if there isn't one.
+    def findNearest(self, cellIndex, x, y, radius, species):
+        nearby = cellIndex.query(x, y, radius)
+        nearby = nearby[(self.species[nearby] == species) & self.isAlive[nearby]]
+        if len(nearby) == 0:
+            return NO_PREY
+        deltaX = self.x[nearby] - x
+        deltaY = self.y[nearby] - y
+        distanceSquared = deltaX * deltaX + deltaY * deltaY
+        closest = int(np.argmin(distanceSquared))
+        if distanceSquared[closest] > radius * radius:
+            return NO_PREY
+        return int(nearby[closest])
+
+    # Returns (nearest, distanceSquared):  for each of animals, the index of the
+    # closest living organism of the species it eats within radius (an array by
+    # species) of it, or NO_PREY if there isn't one, and the squared distance to
+    # it.  Ties go to the lowest index.  Only reads the state of the world.
+    def proposePrey(self, cellIndex, animals, radius):
+        nearest = np.full(len(animals), NO_PREY, np.int64)
+        nearestDistanceSquared = np.zeros(len(animals), np.int64)
+        if len(animals) == 0:
+            return nearest, nearestDistanceSquared
+        animalSpecies = self.species[animals]
+        animalRadius = radius[animalSpecies]
+        x = self.x[animals].astype(np.int64)
+        y = self.y[animals].astype(np.int64)
+        queries, candidates = cellIndex.queryMany(x, y, int(animalRadius.max()))
+        deltaX = self.x[candidates] - x[queries]
+        deltaY = self.y[candidates] - y[queries]
+        distanceSquared = deltaX * deltaX + deltaY * deltaY
+        inReach = ((self.species[candidates] == PREY_SPECIES_ARRAY[animalSpecies][queries])
+                & self.isAlive[candidates] & (distanceSquared <= animalRadius[queries] ** 2))
+        queries = queries[inReach]
+        candidates = candidates[inReach]
+        distanceSquared = distanceSquared[inReach]
+        order = np.lexsort((candidates, distanceSquared, queries))
+        queries, first = np.unique(queries[order], return_index=True)
+        nearest[queries] = candidates[order][first]
+        nearestDistanceSquared[queries] = distanceSquared[order][first]
+        return nearest, nearestDistanceSquared
+
+    # proposePrey split into chunks across self.threads threads
+    def proposePreyInParallel(self, cellIndex, animals, radius):
+        if self.threads <= 1 or len(animals) < self.threads:
+            return self.proposePrey(cellIndex, animals, radius)
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+        proposals = list(self.executor.map(lambda chunk: self.proposePrey(cellIndex, chunk, radius),
+                np.array_split(animals, self.threads)))
+        return (np.concatenate([nearest for nearest, distanceSquared in proposals]),
+                np.concatenate([distanceSquared for nearest, distanceSquared in proposals]))
+
+    # feedAnimals for a batched ArrayWorld.  Every hungry Animal proposes the
+    # prey it would eat and, if it's looking, the prey it would chase, and then
+    # the proposals are settled all at once.
+    def feedAnimalsBatched(self, animals):
+        count = self.count
+        needsNewDestination = np.zeros(count, np.bool_)
+        hungry = animals[self.timeSinceLastEaten[animals] >= self.timeToHunger[self.species[animals]]]
+        if len(hungry) == 0:
+            return needsNewDestination
+
+        cellIndex = CellIndex(self.x[:count], self.y[:count], self.cellSize, self.worldSize)
+        hungrySpecies = self.species[hungry]
+        prey = self.prey
+        isAlive = self.isAlive
+        tolerance = self.config.Animal.REACHED_LOCATION_TOLERANCE
+        searchingMask = ((prey[hungry] == NO_PREY)
+                | ((np.abs(self.x[hungry] - self.destinationX[hungry]) < tolerance)
+                    & (np.abs(self.y[hungry] - self.destinationY[hungry]) < tolerance)))
+        searching = hungry[searchingMask]
+        meals, mealDistances = self.proposePreyInParallel(cellIndex, hungry, self.maxEatRadius)
+        targets, targetDistances = self.proposePreyInParallel(cellIndex, searching, self.sightRadius)
+
+        # Each prey goes to the closest Animal proposing to eat it, ties to the
+        # lowest index
+        ate = np.zeros(len(hungry), np.bool_)
+        for predatorSpecies in FEEDING_ORDER:
+            proposing = np.flatnonzero((hungrySpecies == predatorSpecies) & (meals != NO_PREY) & isAlive[hungry])
+            if len(proposing) == 0:
+                continue
+            proposing = proposing[np.lexsort((hungry[proposing], mealDistances[proposing], meals[proposing]))]
+            eaten, firstProposal = np.unique(meals[proposing], return_index=True)
+            isAlive[eaten] = False
+            self.deaths[organism.PREDATION][PREY_SPECIES[predatorSpecies]] += len(eaten)
+            ate[proposing[firstProposal]] = True
+
+        eaters = hungry[ate]
+        self.timeSinceLastEaten[eaters] = 0
+        # Herbivores only need something else to do if they were chasing their
+        # meal; Carnivores always move on.
+        movingOn = eaters[(self.species[eaters] == CARNIVORE) | (prey[eaters] != NO_PREY)]
+        prey[movingOn] = NO_PREY
+        needsNewDestination[movingOn] = True
+
+        # The rest chase what they saw, unless it was just eaten
+        chasing = ~ate[searchingMask] & isAlive[searching]
+        chasers = searching[chasing]
+        targets = targets[chasing]
+        eatenTargets = targets != NO_PREY
+        eatenTargets[eatenTargets] = ~isAlive[targets[eatenTargets]]
+        targets[eatenTargets] = NO_PREY
+        prey[chasers] = targets
+        found = targets != NO_PREY
+        self.destinationX[chasers[found]] = self.x[targets[found]]
+        self.destinationY[chasers[found]] = self.y[targets[found]]
+        return needsNewDestination
+
+    # Let every hungry Animal eat prey within reach or, failing that, pick prey
+    # within sight to chase.  Returns a mask of the Animals that need a new
+    # destination.  Animals are handled one at a time in index order so that
+    # two Animals can't eat the same prey.
+    def feedAnimals(self, animals):
+        if self.batched:
+            return self.feedAnimalsBatched(animals)
+        count = self.count
+        needsNewDestination = np.zeros(count, np.bool_)
+        species = self.species[animals]
+        hungry = animals[self.timeSinceLastEaten[animals] >= self.timeToHunger[species]]
+        if len(hungry) == 0:
+            return needsNewDestination
+
+        cellIndex = CellIndex(self.x[:count], self.y[:count], self.cellSize, self.worldSize)
+        x = self.x
+        y = self.y
+        prey = self.prey
+        isAlive = self.isAlive
+        tolerance = self.config.Animal.REACHED_LOCATION_TOLERANCE
+        for animal in hungry.tolist():
+            if not isAlive[animal]:
+                continue # Eaten earlier this turn
+            animalSpecies = int(self.species[animal])
+            preySpecies = PREY_SPECIES[animalSpecies]
+            animalX = int(x[animal])
+            animalY = int(y[animal])
+
+            eaten = self.findNearest(cellIndex, animalX, animalY, int(self.maxEatRadius[animalSpecies]), preySpecies)
+            if eaten != NO_PREY:
+                # Eat the unfortunate prey
+                isAlive[eaten] = False
+                self.deaths[organism.PREDATION][preySpecies] += 1
+                self.timeSinceLastEaten[animal] = 0
+                # Herbivores only need something else to do if they were chasing
+                # their meal; Carnivores always move on.
+                if animalSpecies == CARNIVORE or prey[animal] != NO_PREY:
+                    prey[animal] = NO_PREY
+                    needsNewDestination[animal] = True
+                continue
+
+            # Look for prey to chase down
+            if (prey[animal] == NO_PREY
+                    or (abs(animalX - self.destinationX[animal]) < tolerance
+                        and abs(animalY - self.destinationY[animal]) < tolerance)):
+                target = self.findNearest(cellIndex, animalX, animalY, int(self.sightRadius[animalSpecies]), preySpecies)
+                prey[animal] = target
+                if target != NO_PREY:
+                    self.destinationX[animal] = x[target]
+                    self.destinationY[animal] = y[target]
+        return needsNewDestination
+
+    # End the lives of the Animals that have starved
+    def starveAnimals(self, animals):
+        starved = animals[self.timeSinceLastEaten[animals] >= self.timeToStarvation[self.species[animals]]]
+        starved = starved[self.isAlive[starved]] # Eaten before they could starve
+        self.isAlive[starved] = False
+        self.deaths[organism.STARVATION] += np.bincount(self.species[starved], minlength=len(SPECIES))
+
+    # Remove all dead organisms, compacting the arrays and remapping prey indices
+    def purgeDeadOrganisms(self):
+        count = self.count
+        isAlive = self.isAlive[:count].copy()
+        survivors = int(np.count_nonzero(isAlive))
+        if survivors == count:
+            return
+        self.populations -= np.bincount(self.species[:count][~isAlive], minlength=len(SPECIES))
+        newIndex = np.cumsum(isAlive) - 1
+        prey = self.prey[:count]
+        chasing = prey != NO_PREY
+        prey[chasing] = np.where(isAlive[prey[chasing]], newIndex[prey[chasing]], NO_PREY)
+        for name, dtype in self.columns:
+            column = getattr(self, name)
+            column[:survivors] = column[:count][isAlive]
+        self.count = survivors
+
+    # Pass one unit of time for every organism in the world
+    def doTurn(self):
+        self.age[:self.count] += 1
+        self.reproduce()
+
+        count = self.count
+        animals = np.flatnonzero(self.species[:count] != PLANT)
+        self.moveAnimals(animals)
+        needsNewDestination = self.feedAnimals(animals)
+        self.starveAnimals(animals)
+
+        tolerance = self.config.Animal.REACHED_LOCATION_TOLERANCE
+        arrived = ((np.abs(self.x[animals] - self.destinationX[animals]) < tolerance)
+                & (np.abs(self.y[animals] - self.destinationY[animals]) < tolerance))
+        needsNewDestination[animals[arrived]] = True
+        self.pickNewDestinations(np.flatnonzero(needsNewDestination & self.isAlive[:count]))
+
+        self.purgeDeadOrganisms()
@@ -0,0 +1,167 @@
+#!/usr/bin/python
+#
+#    benchmark.py
+#    Ecosystem
+#
+#    Measures how long a tick takes for worlds of different sizes.  Every world
+#    is seeded with the same plant density and the same plant : herbivore :
+#    carnivore ratio as the default config, runs headless for a fixed number of
+#    ticks and reports per-tick latency percentiles plus the time spent in each
+#    phase of a tick.  Results can be written as JSON for comparing releases.
+#
+
+import argparse
+import json
+import math
+import platform
+import time
+import config
+import organism
+import profiler
+import world
+
+ORGANISM_TYPES = (organism.Plant, organism.Herbivore, organism.Carnivore)
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark tick throughput across population sizes.")
+    parser.add_argument("--plants", type=int, nargs="+", default=[1000, 10000, 100000],
+            help="starting plant counts to benchmark (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=200,
+            help="ticks to run for each world (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1,
+            help="seed for the random number generator (default: %(default)s)")
+    parser.add_argument("--area-per-plant", type=float, default=2500.0,
+            help="world area in square pixels per starting plant (default: %(default)s)")
+    parser.add_argument("--engine", choices=("objects", "arrays", "tiled"), default="objects",
+            help="simulate with the Organism classes, the NumPy ArrayWorld or a TiledWorld")
+    parser.add_argument("--batched", action="store_true",
+            help="settle ArrayWorld's feeding and births in bulk each tick")
+    parser.add_argument("--threads", type=int, default=1,
+            help="threads to compute batched proposals on (default: %(default)s)")
+    parser.add_argument("--tiles", type=int, default=None,
+            help="processes to split a TiledWorld between (default: one per CPU)")
+    parser.add_argument("--no-phases", dest="phases", action="store_false",
+            help="don't time individual phases, which adds some overhead to every call")
+    parser.add_argument("--json", metavar="PATH",
+            help="write the results as JSON to PATH")
+    return parser.parse_args()
+
+# Returns the (width, height) of a world with the default aspect ratio and the
+# given area
+def scaledWorldSize(area):
+    aspectRatio = config.WORLD_SIZE[0] / config.WORLD_SIZE[1]
+    height = math.sqrt(area / aspectRatio)
+    return (int(math.ceil(height * aspectRatio)), int(math.ceil(height)))
+
+# Returns the starting count of each organism type for a world with numPlants
+# plants, in the same proportions as the default config
+def startingPopulation(numPlants):
+    return (numPlants,
+            int(round(numPlants * config.NUM_STARTING_HERBIVORES / config.NUM_STARTING_PLANTS)),
+            int(round(numPlants * config.NUM_STARTING_CARNIVORES / config.NUM_STARTING_PLANTS)))
+
+def percentile(sortedValues, fraction):
+    index = min(len(sortedValues) - 1, int(math.ceil(fraction * len(sortedValues))) - 1)
+    return sortedValues[max(0, index)]
+
+def runBenchmark(numPlants, arguments):
+    population = startingPopulation(numPlants)
+    worldSize = scaledWorldSize(numPlants * arguments.area_per_plant)
+    settings = config.copy()
+    settings.WORLD_SIZE = worldSize
+    if arguments.engine == "arrays":
+        from arrayworld import ArrayWorld
+        simulation = ArrayWorld(arguments.seed, settings=settings, batched=arguments.batched,
+                threads=arguments.threads)
+    elif arguments.engine == "tiled":
+        from tiledworld import TiledWorld
+        simulation = TiledWorld(arguments.seed, arguments.tiles, settings)
+    else:
+        simulation = world.World(settings, arguments.seed)
+
+    phaseProfiler = None
+    tickTimes = []
+    perfCounter = time.perf_counter
+    try:
+        startTime = perfCounter()
+        for organismType, number in zip(ORGANISM_TYPES, population):
+            simulation.spawnOrganisms(organismType, number, False)
+        spawnTime = perfCounter() - startTime
+
+        if arguments.phases:
+            phases = profiler.OBJECT_PHASES if arguments.engine == "objects" else profiler.arrayPhases(simulation)
+            phaseProfiler = profiler.Profiler()
+            phaseProfiler.install(phases)
+
+        for tick in range(arguments.ticks):
+            startTime = perfCounter()
+            simulation.doTurn()
+            tickTimes.append(perfCounter() - startTime)
+    finally:
+        if phaseProfiler is not None:
+            phaseProfiler.uninstall()
+        if arguments.engine == "tiled":
+            # Its populations are kept after it's closed
+            simulation.close()
+
+    totalTime = sum(tickTimes)
+    sortedTickTimes = sorted(tickTimes)
+    result = {
+        'startingPopulation': dict(zip((t.__name__ for t in ORGANISM_TYPES), population)),
+        'worldSize': list(worldSize),
+        'spawnSeconds': spawnTime,
+        'ticks': arguments.ticks,
+        'totalSeconds': totalTime,
+        'ticksPerSecond': arguments.ticks / totalTime if totalTime > 0 else None,
+        'tickSeconds': {
+            'mean': totalTime / len(tickTimes),
+            'p50': percentile(sortedTickTimes, 0.50),
+            'p90': percentile(sortedTickTimes, 0.90),
+            'p99': percentile(sortedTickTimes, 0.99),
+            'max': sortedTickTimes[-1],
+        },
+        'finalPopulation': {t.__name__: simulation.countOrganisms(t) for t in ORGANISM_TYPES},
+    }
+    if arguments.phases:
+        # Report every phase, even the ones that never happened
+        phaseTimes = {phase: 0.0 for phase, owner, name in phases if phase != profiler.TICK}
+        for phase, seconds in phaseProfiler.getPhaseTimes().items():
+            if phase != profiler.TICK:
+                phaseTimes[phase] = seconds
+        phaseTimes[profiler.OTHER] = max(0.0, totalTime - sum(phaseTimes.values()))
+        result['phaseSeconds'] = phaseTimes
+    return result
+
+def printResult(result):
+    population = result['startingPopulation']
+    tickSeconds = result['tickSeconds']
+    print("%d plants, %d herbivores, %d carnivores in a %dx%d world (spawned in %.2fs)" % (
+            population['Plant'], population['Herbivore'], population['Carnivore'],
+            result['worldSize'][0], result['worldSize'][1], result['spawnSeconds']))
+    print("    tick: mean %.2fms  p50 %.2fms  p90 %.2fms  p99 %.2fms  max %.2fms" % tuple(
+            1000 * tickSeconds[key] for key in ('mean', 'p50', 'p90', 'p99', 'max')))
+    if 'phaseSeconds' in result:
+        for phase, seconds in result['phaseSeconds'].items():
+            share = seconds / result['totalSeconds'] if result['totalSeconds'] > 0 else 0.0
+            print("    %-14s %8.2fms/tick  %5.1f%%" % (phase, 1000 * seconds / result['ticks'], 100 * share))
+
+if __name__ == "__main__":
+    arguments = parseArguments()
+    results = []
+    for numPlants in arguments.plants:
+        result = runBenchmark(numPlants, arguments)
+        printResult(result)
+        results.append(result)
+
+    if arguments.json:
+        report = {
+            'engine': arguments.engine,
+            'seed': arguments.seed,
+            'areaPerPlant': arguments.area_per_plant,
+            'phasesTimed': arguments.phases,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(arguments.json, "w") as resultsFile:
+            json.dump(report, resultsFile, indent=2)
@@ -5,12 +5,18 @@ DEFAULT_COLOR = (160, 160, 160)
 HOVERED_COLOR = (140, 140, 140)
 CLICKED_COLOR = (100, 100, 100)
 
+# Shared by every Button.  Created the first time a Button is drawn, since
+# pygame.font has to be initialized first.
+font = None
+
 class Button:
     def __init__(self, rect, text, *onClick):
         self.rect = rect
         self.onClick = onClick
         self.isClicked = False
         self.text = text
+        self.textSurface = None # Rendered the first time the Button is drawn
+        self.drawnColor = None # The color the Button was last drawn with
 
     def getEvent(self, event):
         if self.isClicked:
@@ -26,18 +32,28 @@ class Button:
                     event.button == 1 and
                     self.rect.collidepoint(event.pos)):
                 self.isClicked = True
+
+    # Returns the color the Button should be drawn with right now
+    def getColor(self):
+        if self.rect.collidepoint(pygame.mouse.get_pos()):
+            return CLICKED_COLOR if self.isClicked else HOVERED_COLOR
+        return DEFAULT_COLOR
+
+    # Returns true if drawing the Button now would change how it looks
+    def needsRedraw(self):
+        return self.getColor() != self.drawnColor
+
+    # Draw the Button and return the Rect drawn
     def draw(self, screen):
-        isHovered = self.rect.collidepoint(pygame.mouse.get_pos())
-        colorForDraw = None
-        if isHovered:
-            colorForDraw = CLICKED_COLOR if self.isClicked else HOVERED_COLOR 
-        else:
-            colorForDraw = DEFAULT_COLOR
-        pygame.draw.rect(screen, colorForDraw, self.rect)
+        global font
+        self.drawnColor = self.getColor()
+        pygame.draw.rect(screen, self.drawnColor, self.rect)
 
         # Draw the button's text
-        font = pygame.font.Font(None, 60)
-        textSurface = font.render(self.text, True, (0,0,0)) 
-        textRect = textSurface.get_rect(center=self.rect.center)
-        screen.blit(textSurface, textRect)
-
+        if self.textSurface is None:
+            if font is None:
+                font = pygame.font.Font(None, 60)
+            self.textSurface = font.render(self.text, True, (0,0,0))
+        textRect = self.textSurface.get_rect(center=self.rect.center)
+        screen.blit(self.textSurface, textRect)
+        return self.rect
@@ -0,0 +1,336 @@
+#
+#    checkpoint.py
+#    Ecosystem
+#
+#    Saves the complete state of a World or ArrayWorld to a file and loads it
+#    back, so that a long run can be paused and resumed or forked into several
+#    runs from an interesting state.  A loaded world continues exactly as the
+#    saved one would have:  it has the same settings, random number generator
+#    state, organism order, prey, destinations, spatial grid order and
+#    reproduction schedule.
+#
+#    The file is columnar:  after a short JSON header, each per-organism value
+#    is stored as one packed column (in the byte order recorded in the header),
+#    aligned so that it can be read
+#    straight out of a memory map.
+#
+#        MAGIC | header length (8 bytes) | JSON header | column | column | ...
+#
+
+import array
+import gc
+import json
+import mmap
+import os
+import struct
+import sys
+import config
+import organism
+import world
+from spatial import SpatialGrid
+from util import Location
+
+MAGIC = b"ECOSYSCP"
+FORMAT_VERSION = 2
+# Versions that can still be read.  Version 1 stored each Organism's age and
+# last reproduction instead of when it reproduces next, so only ArrayWorlds
+# can be loaded from it.
+READABLE_VERSIONS = (1, 2)
+HEADER_LENGTH = struct.Struct("<Q")
+
+# Columns start at multiples of this many bytes
+ALIGNMENT = 64
+
+# Organism types in the order of their species codes
+SPECIES = (organism.Plant, organism.Herbivore, organism.Carnivore)
+PLANT = SPECIES.index(organism.Plant)
+
+# Value of the prey and destinationOwner columns when there is no Organism
+NO_ORGANISM = -1
+
+# Returns the settings (the config module or a copy of it) as a JSON-friendly
+# dict.  Classes become dicts of their own settings, so inherited settings are
+# only stored once.
+def settingsToDict(settings):
+    values = {}
+    for name, value in vars(settings).items():
+        if isinstance(value, type):
+            values[name] = {settingName: settingValue for settingName, settingValue in vars(value).items()
+                    if settingName.isupper()}
+        elif name.isupper():
+            values[name] = value
+    return values
+
+# Returns a copy of config with the settings from a dict made by settingsToDict
+def settingsFromDict(values):
+    settings = config.copy()
+    for name, value in values.items():
+        if isinstance(value, dict):
+            for settingName, settingValue in value.items():
+                setattr(getattr(settings, name), settingName,
+                        tuple(settingValue) if isinstance(settingValue, list) else settingValue)
+        else:
+            # JSON has no tuples, but settings like WORLD_SIZE are tuples
+            setattr(settings, name, tuple(value) if isinstance(value, list) else value)
+    return settings
+
+# Returns values as the most compact array that holds them exactly
+def packNumbers(values):
+    if all(type(value) is int for value in values):
+        if not values or (-2 ** 31 <= min(values) and max(values) < 2 ** 31):
+            return array.array('i', values)
+        return array.array('q', values)
+    return array.array('d', values)
+
+# Write a checkpoint file from a header dict and a list of (name, typecode,
+# buffer) columns.  typecode is an array module typecode.  The file is written
+# next to path and then renamed, so a crash never leaves a half-written
+# checkpoint behind.
+def writeCheckpoint(path, header, columns):
+    header = dict(header, version=FORMAT_VERSION, byteorder=sys.byteorder, columns=[])
+    offset = 0
+    for name, typecode, buffer in columns:
+        length = memoryview(buffer).nbytes
+        header['columns'].append({'name': name, 'typecode': typecode, 'offset': offset, 'length': length})
+        offset += -(-length // ALIGNMENT) * ALIGNMENT
+    headerBytes = json.dumps(header).encode("utf-8")
+    # Pad the header so that the columns start at a multiple of ALIGNMENT
+    dataStart = -(-(len(MAGIC) + HEADER_LENGTH.size + len(headerBytes)) // ALIGNMENT) * ALIGNMENT
+    headerBytes += b" " * (dataStart - len(MAGIC) - HEADER_LENGTH.size - len(headerBytes))
+
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as checkpointFile:
+        checkpointFile.write(MAGIC)
+        checkpointFile.write(HEADER_LENGTH.pack(len(headerBytes)))
+        checkpointFile.write(headerBytes)
+        for (name, typecode, buffer), column in zip(columns, header['columns']):
+            checkpointFile.write(buffer)
+            checkpointFile.write(b"\0" * (-column['length'] % ALIGNMENT))
+    os.replace(temporaryPath, path)
+
+# Returns (header, data, data start) for a checkpoint file, where data is a
+# read-only memory map of the whole file.  Column offsets in the header are
+# relative to data start.
+def readCheckpoint(checkpointFile):
+    if checkpointFile.read(len(MAGIC)) != MAGIC:
+        raise ValueError(checkpointFile.name + " is not a checkpoint file")
+    headerLength, = HEADER_LENGTH.unpack(checkpointFile.read(HEADER_LENGTH.size))
+    header = json.loads(checkpointFile.read(headerLength).decode("utf-8"))
+    if header['version'] not in READABLE_VERSIONS:
+        raise ValueError("Can't read version " + str(header['version']) + " checkpoints")
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError("Checkpoint was written on a " + header['byteorder'] + "-endian machine")
+    data = mmap.mmap(checkpointFile.fileno(), 0, access=mmap.ACCESS_READ)
+    return header, data, len(MAGIC) + HEADER_LENGTH.size + headerLength
+
+# Save the state of simulation (a World or an ArrayWorld) to path.  metadata is
+# an optional JSON-friendly dict stored with it, e.g. the number of ticks run so
+# far.  Checkpoints can only be taken between ticks.
+def saveCheckpoint(simulation, path, metadata=None):
+    header = {'settings': settingsToDict(simulation.config),
+            'randomState': simulation.getRandomState(),
+            'metadata': metadata or {}}
+    if isinstance(simulation, world.World):
+        header['engine'] = "objects"
+        columns = packWorld(simulation, header)
+    else:
+        header['engine'] = "arrays"
+        columns = packArrayWorld(simulation, header)
+    writeCheckpoint(path, header, columns)
+
+# Returns (simulation, metadata) for the checkpoint at path.  simulation is a
+# World or an ArrayWorld, whichever was saved.
+def loadCheckpoint(path):
+    with open(path, "rb") as checkpointFile:
+        header, data, dataStart = readCheckpoint(checkpointFile)
+    if header['engine'] == "objects" and header['version'] < 2:
+        data.close()
+        raise ValueError("Can't read version " + str(header['version']) + " checkpoints of a World")
+    try:
+        view = memoryview(data)
+        columns = {column['name']: view[dataStart + column['offset']:
+                dataStart + column['offset'] + column['length']].cast(column['typecode'])
+                for column in header['columns']}
+        settings = settingsFromDict(header['settings'])
+        if header['engine'] == "objects":
+            # None of the new Organisms can be garbage until loading is done, so
+            # don't let creating millions of them set off full collections
+            gc.disable()
+            try:
+                simulation = unpackWorld(header, columns, settings)
+            finally:
+                gc.enable()
+        else:
+            simulation = unpackArrayWorld(header, columns, settings)
+        simulation.setRandomState(header['randomState'])
+        for column in columns.values():
+            column.release()
+        view.release()
+    finally:
+        data.close()
+    return simulation, header['metadata']
+
+# Returns the columns for the Organisms in theWorld and adds what else is needed
+# to restore it to header
+def packWorld(theWorld, header):
+    if theWorld.deadOrganisms:
+        raise ValueError("A World can only be saved between ticks")
+    organisms = theWorld.organisms
+    speciesNumbers = {organismType: number for number, organismType in enumerate(SPECIES)}
+
+    # An Animal's destination may be the Location of another Organism, which it
+    # follows as that Organism moves
+    locationOwners = {id(theOrganism.location): theOrganism.index for theOrganism in organisms}
+
+    # The order of the Organisms in each grid cell decides which one is found
+    # first, so it has to be restored too
+    gridRank = [0] * len(organisms)
+    for typeGrid in theWorld.grids.values():
+        for bucket in typeGrid.cells.values():
+            for rank, theOrganism in enumerate(bucket):
+                gridRank[theOrganism.index] = rank
+    header['gridTypes'] = [organismType.__name__ for organismType in theWorld.grids]
+    header['tick'] = theWorld.tick
+    header['reproductionSequence'] = theWorld.reproductionQueue.sequence
+
+    # Position of each Animal in the order Animals take their turns
+    turnOrder = [NO_ORGANISM] * len(organisms)
+    for order, theAnimal in enumerate(theWorld.animals):
+        turnOrder[theAnimal.index] = order
+
+    values = {name: [] for name in ('x', 'y', 'birthTick', 'reproductionTick', 'reproductionOrder',
+            'timeSinceLastEaten', 'destinationX', 'destinationY', 'destinationOwner', 'prey')}
+    species = array.array('b')
+    hasSpawnRing = array.array('b')
+    for theOrganism in organisms:
+        species.append(speciesNumbers[type(theOrganism)])
+        values['x'].append(theOrganism.location.x)
+        values['y'].append(theOrganism.location.y)
+        values['birthTick'].append(theOrganism.birthTick)
+        values['reproductionTick'].append(theOrganism.reproductionTick)
+        values['reproductionOrder'].append(theOrganism.reproductionOrder)
+        hasSpawnRing.append(theOrganism.hasSpawnRing)
+        if isinstance(theOrganism, organism.Animal):
+            values['timeSinceLastEaten'].append(theOrganism.timeSinceLastEaten)
+            destination = theOrganism.destination
+            values['destinationX'].append(destination.x)
+            values['destinationY'].append(destination.y)
+            values['destinationOwner'].append(locationOwners.get(id(destination), NO_ORGANISM))
+            # Prey that has died is dropped at the start of the Animal's next turn
+            # before anything looks at it, so it's saved as no prey
+            prey = theOrganism.prey
+            values['prey'].append(prey.index if prey is not None and prey.isAlive else NO_ORGANISM)
+        else:
+            for name in ('timeSinceLastEaten', 'destinationX', 'destinationY'):
+                values[name].append(0)
+            values['destinationOwner'].append(NO_ORGANISM)
+            values['prey'].append(NO_ORGANISM)
+    values['gridRank'] = gridRank
+    values['turnOrder'] = turnOrder
+
+    columns = [('species', 'b', species), ('hasSpawnRing', 'b', hasSpawnRing)]
+    for name, columnValues in values.items():
+        column = packNumbers(columnValues)
+        columns.append((name, column.typecode, column))
+    return columns
+
+# Returns a World with the Organisms in columns
+def unpackWorld(header, columns, settings):
+    theWorld = world.World(settings)
+    theWorld.tick = header['tick']
+    # The Organisms are created without calling __init__, which would use the
+    # World's random number generator, and every slot is filled in here instead
+    speciesTraits = [(organismType, theWorld.getTraits(organismType)) for organismType in SPECIES]
+
+    # Lists are much faster to iterate than memoryviews
+    species, x, y, birthTick, reproductionTick, reproductionOrder, hasSpawnRing, timeSinceLastEaten = (
+            columns[name].tolist() for name in ('species', 'x', 'y', 'birthTick', 'reproductionTick',
+                    'reproductionOrder', 'hasSpawnRing', 'timeSinceLastEaten'))
+    organisms = []
+    addOrganism = organisms.append
+    for index, (organismSpecies, organismX, organismY, organismBirthTick, organismReproductionTick,
+            organismReproductionOrder, organismHasSpawnRing, organismTimeSinceLastEaten) in enumerate(
+            zip(species, x, y, birthTick, reproductionTick, reproductionOrder, hasSpawnRing, timeSinceLastEaten)):
+        organismType, traits = speciesTraits[organismSpecies]
+        theOrganism = organismType.__new__(organismType)
+        theOrganism.world = theWorld
+        theOrganism.traits = traits
+        theOrganism.isAlive = True
+        theOrganism.location = Location(organismX, organismY)
+        theOrganism.index = index
+        theOrganism.birthTick = organismBirthTick
+        theOrganism.reproductionTick = organismReproductionTick
+        theOrganism.reproductionOrder = organismReproductionOrder
+        theOrganism.hasSpawnRing = organismHasSpawnRing == 1
+        if organismSpecies != PLANT:
+            theOrganism.timeSinceLastEaten = organismTimeSinceLastEaten
+        addOrganism(theOrganism)
+
+    # Destinations and prey refer to other Organisms, so they're linked up once
+    # every Organism exists
+    destinationX, destinationY, destinationOwner, prey = (columns[name].tolist()
+            for name in ('destinationX', 'destinationY', 'destinationOwner', 'prey'))
+    for index in range(len(organisms)):
+        if species[index] != PLANT:
+            theOrganism = organisms[index]
+            owner = destinationOwner[index]
+            theOrganism.wanderDestination = Location(destinationX[index], destinationY[index])
+            theOrganism.setDestination(organisms[owner].location if owner != NO_ORGANISM
+                    else theOrganism.wanderDestination)
+            theOrganism.prey = organisms[prey[index]] if prey[index] != NO_ORGANISM else None
+
+    theWorld.organisms = organisms
+    turnOrder = columns['turnOrder'].tolist()
+    theWorld.animals = sorted((theOrganism for theOrganism, order in zip(organisms, turnOrder)
+            if order != NO_ORGANISM), key=lambda theAnimal: turnOrder[theAnimal.index])
+    theWorld.reproductionQueue.sequence = header['reproductionSequence']
+    theWorld.reproductionQueue.restore(organisms)
+    organismTypes = {organismType.__name__: organismType for organismType in SPECIES}
+    for name in header['gridTypes']:
+        organismType = organismTypes[name]
+        theWorld.grids[organismType] = SpatialGrid(theWorld.gridCellSize)
+        theWorld.populations[organismType] = 0
+    for organismType in SPECIES:
+        theWorld.populations[organismType] = species.count(SPECIES.index(organismType))
+
+    # Fill the grid cells the way SpatialGrid.insert would, in the saved order
+    cellSize = theWorld.gridCellSize
+    cellsBySpecies = [theWorld.grids[organismType].cells if organismType in theWorld.grids else None
+            for organismType in SPECIES]
+    gridRank = columns['gridRank'].tolist()
+    organismsByRank = [[] for rank in range(max(gridRank, default=0) + 1)]
+    for theOrganism, organismSpecies, organismX, organismY, rank in zip(organisms, species, x, y, gridRank):
+        cell = (int(organismX // cellSize), int(organismY // cellSize))
+        theOrganism.gridCell = cell
+        organismsByRank[rank].append((theOrganism, cellsBySpecies[organismSpecies], cell))
+    for rankOrganisms in organismsByRank:
+        for theOrganism, cells, cell in rankOrganisms:
+            bucket = cells.get(cell)
+            if bucket is None:
+                bucket = cells[cell] = {}
+            bucket[theOrganism] = None
+    return theWorld
+
+# Returns the columns of an ArrayWorld and adds what else is needed to restore it
+# to header
+def packArrayWorld(simulation, header):
+    import arrayworld
+    count = simulation.count
+    header['count'] = count
+    header['batched'] = simulation.batched
+    return [(name, getattr(simulation, name).dtype.char, getattr(simulation, name)[:count])
+            for name, dtype in arrayworld.COLUMNS]
+
+# Returns an ArrayWorld with the state in columns
+def unpackArrayWorld(header, columns, settings):
+    import numpy as np
+    import arrayworld
+    count = header['count']
+    simulation = arrayworld.ArrayWorld(capacity=max(count, 1024), settings=settings,
+            batched=header.get('batched', False))
+    for name, dtype in arrayworld.COLUMNS:
+        getattr(simulation, name)[:count] = np.frombuffer(columns[name], dtype, count)
+    simulation.count = count
+    simulation.populations[:] = np.bincount(simulation.species[:count][simulation.isAlive[:count]],
+            minlength=len(arrayworld.SPECIES))
+    return simulation
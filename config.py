@@ -24,6 +24,11 @@ NUM_STARTING_CARNIVORES = 2
 
 # Graphics settings
 SCREEN_SIZE = (WORLD_SIZE[0] + STATUS_SECTION_SIZE[0], max(WORLD_SIZE[1], STATUS_SECTION_SIZE[1]))
+FRAME_RATE = 30 # Frames drawn per second
+
+# Ticks simulated per second in the window at normal speed, or None to simulate
+# as fast as possible
+TICK_RATE = 20
 
 class Organism:
     MAX_ATTEMPTS_TO_REPRODUCE = 1
@@ -63,3 +68,23 @@ class Carnivore(Animal):
 
     MAX_TIME_BETWEEN_REPRODUCTION = 600000
     REPRODUCTION_RADIUS = 20 # Radius within which children are created
+
+# Returns an independent copy of these settings:  a namespace with the same names
+# as this module that can be changed (e.g. for one World) without affecting this
+# module or other copies.  The classes are copied along with their inheritance,
+# so changing Organism.MAX_ATTEMPTS_TO_REPRODUCE in a copy still reaches that
+# copy's Plant, Herbivore and Carnivore.
+def copy():
+    import types
+    settings = types.SimpleNamespace()
+    copiedClasses = {}
+    for name, value in list(globals().items()):
+        if name.startswith('_') or isinstance(value, (types.FunctionType, types.ModuleType)):
+            continue
+        if isinstance(value, type):
+            bases = tuple(copiedClasses.get(base, base) for base in value.__bases__)
+            attributes = {key: attribute for key, attribute in vars(value).items() if not key.startswith('__')}
+            copiedClasses[value] = type(value.__name__, bases, attributes)
+            value = copiedClasses[value]
+        setattr(settings, name, value)
+    return settings
@@ -11,7 +11,7 @@ from button import Button
 import config
 import organism
 import pygame
-import world
+import sprites
 from util import Location
 
 COLORS = {'black': (0, 0, 0),
@@ -37,133 +37,271 @@ ORGANISM_ADD_BUTTON_TOP = 120
 ORGANISM_ADD_BUTTON_PADDING_TOP = 130
 ORGANISM_ADD_BUTTON_WIDTH = 70
 ORGANISM_ADD_BUTTON_HEIGHT = 50
+
+SCHEDULER_STATUS_LEFT = WORLD_SIZE[0] + 15
+SCHEDULER_STATUS_TOP = config.SCREEN_SIZE[1] - 35
+
+# While the simulation is being profiled the profile is shown in place of the
+# organism counts and buttons
+PROFILE_RECT = pygame.Rect(WORLD_SIZE[0] + 2, 0, STATUS_SECTION_SIZE[0] - 2, SCHEDULER_STATUS_TOP - 5)
+PROFILE_LINE_HEIGHT = 15
+
+# What each key does to the simulation
+SCHEDULER_KEYS = {pygame.K_SPACE: lambda simulation: simulation.togglePause(),
+        pygame.K_1: lambda simulation: simulation.setSpeed(1),
+        pygame.K_2: lambda simulation: simulation.setSpeed(10),
+        pygame.K_3: lambda simulation: simulation.setSpeed(100),
+        pygame.K_p: lambda simulation: simulation.toggleProfiler()}
+
+# When more than this many Rects changed in a frame it's cheaper to redraw the
+# background and update the whole display than to handle each Rect separately
+MAX_DIRTY_RECTS = 500
  
 # We'll store the graphics state as module-level variables.
 initialized = False
+simulation = None # The SimulationProcess being drawn
+currentSnapshot = None # The Snapshot of it on the screen
 screen = None
 organismCountFont = None
-clock = None
+statusFont = None
+profileFont = None
+drawnStatus = None # (text shown, Rect of the text) for the scheduler status
+drawnProfile = None # The lines of the profile shown, or None if it isn't shown
 buttons = []
+renderer = None # Draws the organisms
+staticLayer = None # The background and the parts of the menu that never change
+drawnCounts = {} # Maps organism type to (count shown, Rect of its text)
+organismRects = [] # The Rects the organisms were drawn in last frame
+needsFullUpdate = True # Whether the next frame has to update the whole display
 
-def initialize():
-    global initialized, screen, organismCountFont, clock, buttons
+# simulationToDraw is the SimulationProcess whose Snapshots will be drawn.  The
+# buttons and keys send it commands.
+def initialize(simulationToDraw):
+    global initialized, simulation, screen, organismCountFont, statusFont, profileFont, buttons, renderer
     if not initialized:
+        simulation = simulationToDraw
+
         pygame.init()
         
         # Set up the screen
         screen = pygame.display.set_mode(config.SCREEN_SIZE)
         organismCountFont = pygame.font.SysFont("monospace", 60)
+        statusFont = pygame.font.SysFont("monospace", 20)
+        profileFont = pygame.font.SysFont("monospace", 12)
 
         # Set text on window top bar
         pygame.display.set_caption("Ecosystem")
-
-        clock = pygame.time.Clock()
     
         plantButtonRect = pygame.Rect(ORGANISM_ADD_BUTTON_LEFT, ORGANISM_ADD_BUTTON_TOP, ORGANISM_ADD_BUTTON_WIDTH, ORGANISM_ADD_BUTTON_HEIGHT)
         herbivoreButtonRect = pygame.Rect(ORGANISM_ADD_BUTTON_LEFT, ORGANISM_ADD_BUTTON_TOP + ORGANISM_ADD_BUTTON_PADDING_TOP, ORGANISM_ADD_BUTTON_WIDTH, ORGANISM_ADD_BUTTON_HEIGHT)
         carnivoreButtonRect = pygame.Rect(ORGANISM_ADD_BUTTON_LEFT, ORGANISM_ADD_BUTTON_TOP + 2 * ORGANISM_ADD_BUTTON_PADDING_TOP, ORGANISM_ADD_BUTTON_WIDTH, ORGANISM_ADD_BUTTON_HEIGHT)
-        buttons.append(Button(plantButtonRect, "+1", world.spawnOrganisms, organism.Plant, 1, True))
-        buttons.append(Button(herbivoreButtonRect, "+1", world.spawnOrganisms, organism.Herbivore, 1, True))
-        buttons.append(Button(carnivoreButtonRect, "+1", world.spawnOrganisms, organism.Carnivore, 1, True))
+        buttons.append(Button(plantButtonRect, "+1", spawnOrganismFromButton, organism.Plant))
+        buttons.append(Button(herbivoreButtonRect, "+1", spawnOrganismFromButton, organism.Herbivore))
+        buttons.append(Button(carnivoreButtonRect, "+1", spawnOrganismFromButton, organism.Carnivore))
+
+        renderer = sprites.SpriteRenderer(config)
+        createStaticLayer()
+        screen.blit(staticLayer, (0, 0))
         
         initialized = True
         
     else:
         raise Exception("Graphics should only be initialized once")
         
+# Spawn one organism of the given type for an add button.  It shows up in the
+# next Snapshot.
+def spawnOrganismFromButton(organismType):
+    simulation.spawnOrganism(organismType)
+
 def quit():
     print("Exiting...")
     if initialized:
         pygame.quit()
     
-def drawMenu():
+# Draw the parts of the screen that never change (the background, the divider
+# between the main screen and the menu and the organism menu icons) once, so
+# each frame only has to copy them back where something was drawn over them.
+def createStaticLayer():
+    global staticLayer
+    staticLayer = pygame.Surface(config.SCREEN_SIZE).convert()
+    staticLayer.fill(COLORS['white'])
+
     # Draw divider between main screen and menu 
-    pygame.draw.line(screen, COLORS['darkGrey'], (WORLD_SIZE[0], 0),
+    pygame.draw.line(staticLayer, COLORS['darkGrey'], (WORLD_SIZE[0], 0),
         (WORLD_SIZE[0], WORLD_SIZE[1]), 3)
 
     # Draw organism menu icons
-    pygame.draw.circle(screen, COLORS['green'],
+    pygame.draw.circle(staticLayer, COLORS['green'],
         [ORGANISM_STATS_LEFT, ORGANISM_STATS_TOP], config.Plant.SIZE * 2)
-    pygame.draw.circle(screen, COLORS['blue'],
+    pygame.draw.circle(staticLayer, COLORS['blue'],
         [ORGANISM_STATS_LEFT, ORGANISM_STATS_TOP + ORGANISM_STATS_PADDING_TOP], config.Herbivore.SIZE * 2)
-    pygame.draw.circle(screen, COLORS['blue'],
+    pygame.draw.circle(staticLayer, COLORS['blue'],
         [ORGANISM_STATS_LEFT, ORGANISM_STATS_TOP + 2 * ORGANISM_STATS_PADDING_TOP], config.Carnivore.SIZE * 2)
 
-    # Tally the count of each organism
-    numPlants = 0
-    numHerbivores = 0
-    numCarnivores = 0
-    for theOrganism in world.organisms:
-        if isinstance(theOrganism, organism.Plant):
-            numPlants += 1
-        elif isinstance(theOrganism, organism.Herbivore):
-            numHerbivores += 1
-        else:
-            assert isinstance(theOrganism, organism.Carnivore)
-            numCarnivores += 1
-
-    # Draw the count of each organism
-    plantCountText = organismCountFont.render(str(numPlants), 0, COLORS['black'], COLORS['white']) 
-    screen.blit(plantCountText, [ORGANISM_STATS_LEFT + 30, ORGANISM_STATS_TOP - 20])
-    herbivoreCountText = organismCountFont.render(str(numHerbivores), 0, COLORS['black'], COLORS['white']) 
-    screen.blit(herbivoreCountText, [ORGANISM_STATS_LEFT + 30, (ORGANISM_STATS_TOP + ORGANISM_STATS_PADDING_TOP) - 20])
-    carnivoreCountText = organismCountFont.render(str(numCarnivores), 0, COLORS['black'], COLORS['white']) 
-    screen.blit(carnivoreCountText, [ORGANISM_STATS_LEFT + 30, (ORGANISM_STATS_TOP + 2 * ORGANISM_STATS_PADDING_TOP) - 20])
+# Copy the static layer back over each of rects
+def restoreBackground(rects):
+    for rect in rects:
+        screen.blit(staticLayer, rect, rect)
+
+# Returns true if any of rects overlaps a part of the menu that drawMenu draws
+def overlapsMenu(rects):
+    for count, countRect in drawnCounts.values():
+        if countRect.collidelist(rects) != -1:
+            return True
+    if drawnStatus is not None and drawnStatus[1].collidelist(rects) != -1:
+        return True
+    if drawnProfile is not None and PROFILE_RECT.collidelist(rects) != -1:
+        return True
+    return any(button.rect.collidelist(rects) != -1 for button in buttons)
+
+# Returns the lines to show for a Profiler.summary():  the milliseconds per tick
+# spent in each phase by each species
+def describeProfile(profile):
+    lines = ["Profile      ms/tick"]
+    for phase, species, secondsPerTick, callsPerTick in profile:
+        lines.append("%-12s %-4s %6.2f" % (phase, species[:4], 1000 * secondsPerTick))
+    return lines
+
+# Draw the lines of a profile in place of the organism counts and buttons.
+# Returns the Rect drawn.
+def drawProfile(lines):
+    screen.fill(COLORS['white'], PROFILE_RECT)
+    for row, line in enumerate(lines):
+        lineText = profileFont.render(line, 0, COLORS['black'], COLORS['white'])
+        screen.blit(lineText, [PROFILE_RECT.x + 8, PROFILE_RECT.y + 10 + row * PROFILE_LINE_HEIGHT])
+    return PROFILE_RECT
+
+# Draw the parts of the menu that have changed since the last frame, or all of
+# them if redrawAll.  Returns the Rects that changed.
+def drawMenu(redrawAll):
+    global drawnStatus, drawnProfile
+    changedRects = []
+
+    profile = currentSnapshot.profile
+    if (profile is None) != (drawnProfile is None):
+        # Switching between the profile and the organism counts
+        restoreBackground([PROFILE_RECT])
+        changedRects.append(PROFILE_RECT)
+        drawnProfile = None
+        redrawAll = True
+
+    if profile is not None:
+        lines = describeProfile(profile)
+        if lines != drawnProfile or redrawAll:
+            changedRects.append(drawProfile(lines))
+            drawnProfile = lines
+    else:
+        changedRects.extend(drawOrganismStats(redrawAll))
+
+    # Draw how fast the simulation is running when that changes
+    status = currentSnapshot.describeSpeed()
+    if drawnStatus is None or status != drawnStatus[0] or redrawAll:
+        if drawnStatus is not None:
+            restoreBackground([drawnStatus[1]])
+            changedRects.append(drawnStatus[1])
+        statusText = statusFont.render(status, 0, COLORS['black'], COLORS['white'])
+        statusRect = screen.blit(statusText, [SCHEDULER_STATUS_LEFT, SCHEDULER_STATUS_TOP])
+        drawnStatus = (status, statusRect)
+        changedRects.append(statusRect)
+
+    return changedRects
+
+# Draw the count of each organism and the add buttons where they've changed
+# since the last frame, or all of them if redrawAll.  Returns the Rects that
+# changed.
+def drawOrganismStats(redrawAll):
+    changedRects = []
+
+    # Draw the count of each organism when it changes
+    for row, organismType in enumerate((organism.Plant, organism.Herbivore, organism.Carnivore)):
+        count = currentSnapshot.countOrganisms(organismType)
+        drawnCount, drawnRect = drawnCounts.get(organismType, (None, None))
+        if count == drawnCount and not redrawAll:
+            continue
+        if drawnRect is not None:
+            # The new count might be narrower than the old one
+            restoreBackground([drawnRect])
+            changedRects.append(drawnRect)
+        countText = organismCountFont.render(str(count), 0, COLORS['black'], COLORS['white'])
+        countRect = screen.blit(countText,
+                [ORGANISM_STATS_LEFT + 30, (ORGANISM_STATS_TOP + row * ORGANISM_STATS_PADDING_TOP) - 20])
+        drawnCounts[organismType] = (count, countRect)
+        changedRects.append(countRect)
 
     for button in buttons:
-        for button in buttons:
-            button.draw(screen) 
+        if redrawAll or button.needsRedraw():
+            changedRects.append(button.draw(screen))
+
+    return changedRects
 
 
 def testButton():
     print("Button clicked")
  
+# Draw every organism and return the Rects they were drawn in
 def drawOrganisms():
-    for organism in world.organisms:
-        organism.draw()
+    return renderer.draw(screen, currentSnapshot)
     
-def draw():
+# Draw theSnapshot as the next frame.  Only the parts of the screen that changed since the last
+# frame are redrawn and sent to the display:  the places the organisms were
+# drawn last frame and this frame, and the menu items that changed.
+def draw(theSnapshot):
+    global currentSnapshot, organismRects, needsFullUpdate
     assert initialized, "Graphics should be initialized"
     assert not screen is None, "Should have a screen"
-    screen.fill(COLORS['white'])
-    
-    drawOrganisms()
-  
-    # @todo Drawn menu on separate screen so we only have to do it once? 
-    drawMenu()
- 
-    pygame.display.flip()
+    currentSnapshot = theSnapshot
+
+    # Erase the organisms drawn last frame
+    previousOrganismRects = organismRects
+    if len(previousOrganismRects) > MAX_DIRTY_RECTS:
+        screen.blit(staticLayer, (0, 0))
+        needsFullUpdate = True
+    else:
+        restoreBackground(previousOrganismRects)
+    redrawMenu = needsFullUpdate or overlapsMenu(previousOrganismRects)
+
+    organismRects = drawOrganisms()
+    menuRects = drawMenu(redrawMenu)
+
+    if needsFullUpdate or len(previousOrganismRects) + len(organismRects) > MAX_DIRTY_RECTS:
+        pygame.display.flip()
+    else:
+        pygame.display.update(previousOrganismRects + organismRects + menuRects)
+    needsFullUpdate = False
 
 # Handle user events.  Returns true if process should continue, false otherwise
-def handleEvents(world):
+def handleEvents():
+    global needsFullUpdate
     assert initialized, "Graphics should be initialized"
     shouldContinue = True
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             shouldContinue = False
-        elif event.type == pygame.MOUSEBUTTONUP or event.type == pygame.MOUSEBUTTONDOWN:
+        elif event.type == pygame.VIDEOEXPOSE:
+            # The window manager lost what was on the display
+            needsFullUpdate = True
+        elif (event.type == pygame.MOUSEBUTTONUP or event.type == pygame.MOUSEBUTTONDOWN) \
+                and drawnProfile is None: # The profile covers the buttons
             for button in buttons:
                 button.getEvent(event)
+        elif event.type == pygame.KEYDOWN and event.key in SCHEDULER_KEYS:
+            SCHEDULER_KEYS[event.key](simulation)
             
     return shouldContinue
     
-def advanceClock():
-    assert initialized, "Graphics should be initialized"
-    assert not clock is None, "Should have a screen"
-    clock.tick(20)
-    
 def getTransitionColor(startColor, endColor, transitionPercentage):
     deltaColor = [end - start for end, start in zip(endColor, startColor)]
     return [start + delta * transitionPercentage for start, delta in zip(startColor, deltaColor)]
 
-# Draw a status bar centered at centerLocation.  width specifies the width of the
-# bar in pixels.  amoountFilled is a fraction from 0 to 1.
-def drawStatusBar(centerLocation, width, amountFilled):
-    assert amountFilled >= 0.0 and amountFilled <= 1.0
+# Draw a status bar on surface centered at centerLocation.  width specifies the
+# width of the bar in pixels and filledWidth how many of those are filled.
+# Returns the Rect drawn.
+def drawStatusBar(surface, centerLocation, width, filledWidth):
+    assert filledWidth >= 0 and filledWidth <= width
     topLeft = Location(int(centerLocation.x - width / 2.0),
             int(centerLocation.y - STATUS_BAR_HEIGHT / 2.0))
-    pygame.draw.rect(screen, COLORS['grey'],
+    rect = pygame.draw.rect(surface, COLORS['grey'],
             [topLeft.x, topLeft.y, width, STATUS_BAR_HEIGHT])
-    pygame.draw.rect(screen, COLORS['yellow'],
-            [topLeft.x, topLeft.y, int(width * amountFilled), STATUS_BAR_HEIGHT])
-            
+    pygame.draw.rect(surface, COLORS['yellow'],
+            [topLeft.x, topLeft.y, filledWidth, STATUS_BAR_HEIGHT])
+    return rect
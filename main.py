@@ -8,34 +8,192 @@
 #    Ecosystem
 #
 
-from organism import Organism
+import argparse
+import sys
+import time
+import checkpoint
+import profiler
+import tracing
+from telemetry import TelemetryRecorder
+from worker import SimulationProcess
 import world
-import graphics
 import config
 import organism
-from util import LOGGING
+
+# Returns the event categories in a comma-separated list such as "eat,starve"
+def parseEventCategories(text):
+    categories = tuple(category.strip() for category in text.split(",") if category.strip())
+    for category in categories:
+        if category not in tracing.CATEGORIES:
+            raise argparse.ArgumentTypeError("unknown event category " + repr(category))
+    return categories
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Simulator for an ecosystem with predators, prey etc.")
+    parser.add_argument("--headless", action="store_true",
+            help="run the simulation as fast as possible without a display")
+    parser.add_argument("--ticks", type=int, default=1000,
+            help="number of ticks to simulate in headless mode (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None,
+            help="seed for the random number generator")
+    parser.add_argument("--engine", choices=("objects", "arrays", "tiled"), default="objects",
+            help="simulate with the Organism classes, the NumPy ArrayWorld or a TiledWorld split across "
+            "processes (headless only)")
+    parser.add_argument("--batched", action="store_true",
+            help="settle feeding and births in bulk each tick (with --engine arrays)")
+    parser.add_argument("--threads", type=int, default=1,
+            help="threads to compute batched proposals on (default: %(default)s)")
+    parser.add_argument("--tiles", type=int, default=None,
+            help="processes to split the world between (with --engine tiled, default: one per CPU)")
+    parser.add_argument("--tick-rate", type=float, default=config.TICK_RATE,
+            help="ticks per second in the window at normal speed, or 0 to simulate "
+            "as fast as possible (default: %(default)s)")
+    parser.add_argument("--frame-rate", type=float, default=config.FRAME_RATE,
+            help="frames per second to draw (default: %(default)s)")
+    parser.add_argument("--resume", metavar="CHECKPOINT",
+            help="continue the run saved in CHECKPOINT (headless only) instead of starting a new one")
+    parser.add_argument("--save", metavar="CHECKPOINT",
+            help="save the world to CHECKPOINT at the end of a headless run")
+    parser.add_argument("--telemetry", metavar="PATH",
+            help="append statistics about every tick to the CSV file PATH")
+    parser.add_argument("--profile", action="store_true",
+            help="report the time spent in each phase of a tick by each species after a headless "
+            "run (press P to show it in the window)")
+    parser.add_argument("--trace", metavar="PATH",
+            help="write the events of a headless run to PATH as JSON lines")
+    parser.add_argument("--trace-events", type=parseEventCategories,
+            default=(tracing.SPAWN, tracing.REPRODUCE, tracing.EAT, tracing.STARVE),
+            help="comma-separated categories of event to trace, out of " + ", ".join(tracing.CATEGORIES)
+            + " (default: all but move)")
+    arguments = parser.parse_args()
+    if arguments.engine != "objects" and not arguments.headless:
+        parser.error("--engine " + arguments.engine + " requires --headless")
+    if (arguments.batched or arguments.threads != 1) and arguments.engine != "arrays":
+        parser.error("--batched and --threads require --engine arrays")
+    if arguments.tiles is not None and arguments.engine != "tiled":
+        parser.error("--tiles requires --engine tiled")
+    if (arguments.resume or arguments.save) and arguments.engine == "tiled":
+        parser.error("--resume and --save don't work with --engine tiled")
+    if (arguments.resume or arguments.save) and not arguments.headless:
+        parser.error("--resume and --save require --headless")
+    if arguments.trace and (not arguments.headless or arguments.engine != "objects"):
+        parser.error("--trace requires --headless and the objects engine")
+    return arguments
+
+# simulation is either a World or an ArrayWorld
+def spawnStartingOrganisms(simulation):
+    for organismType, number in ((organism.Plant, config.NUM_STARTING_PLANTS),
+            (organism.Herbivore, config.NUM_STARTING_HERBIVORES),
+            (organism.Carnivore, config.NUM_STARTING_CARNIVORES)):
+        numberSpawned = simulation.spawnOrganisms(organismType, number, False)
+        if numberSpawned < number:
+            print("Only had room for", numberSpawned, "of", number, organismType.__name__ + "s")
+
+def printPopulations(simulation):
+    for organismType in (organism.Plant, organism.Herbivore, organism.Carnivore):
+        print(organismType.__name__ + "s:", simulation.countOrganisms(organismType))
+
+# Run the simulation for the given number of ticks without importing pygame,
+# then report how fast it went.  If savePath is given, the simulation is saved
+# there afterwards.  ticksSoFar is how many ticks a resumed simulation had
+# already run.  If telemetryPath is given, statistics about each tick are
+# appended to it.  If profile, the time spent in each phase of a tick is
+# reported too.
+def runHeadless(simulation, ticks, savePath=None, ticksSoFar=0, telemetryPath=None, profile=False):
+    phaseProfiler = None
+    if profile:
+        phaseProfiler = profiler.Profiler()
+        phaseProfiler.install(profiler.OBJECT_PHASES if isinstance(simulation, world.World)
+                else profiler.arrayPhases(simulation))
+    recorder = None
+    doTurn = simulation.doTurn
+    if telemetryPath is not None:
+        recorder = TelemetryRecorder(simulation, telemetryPath, ticksSoFar)
+        doTurn = recorder.doTurn
+    startTime = time.perf_counter()
+    try:
+        for tick in range(ticks):
+            doTurn()
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if phaseProfiler is not None:
+            phaseProfiler.uninstall()
+    elapsedTime = time.perf_counter() - startTime
+
+    print("Simulated", ticks, "ticks in", "%.3f" % elapsedTime, "seconds",
+            "(%.1f ticks/sec)" % (ticks / elapsedTime if elapsedTime > 0 else float("inf")))
+    printPopulations(simulation)
+    if phaseProfiler is not None:
+        print("Time per tick by phase and species:")
+        for line in profiler.describeSummary(phaseProfiler.summary()):
+            print("   ", line)
+
+    if savePath is not None:
+        checkpoint.saveCheckpoint(simulation, savePath, {'tick': ticksSoFar + ticks})
+        print("Saved tick", ticksSoFar + ticks, "to", savePath)
+
+# Run the simulation in a window.  The World runs in a worker process while this
+# one draws Snapshots of it.  Space pauses it, 1, 2 and 3 run it at normal
+# speed, 10 times speed and 100 times speed and P shows or hides a profile of
+# its ticks.  If telemetryPath is given,
+# statistics about each tick are appended to it.
+def runInteractive(seed, tickRate, frameRate, telemetryPath=None):
+    import graphics
+
+    simulation = SimulationProcess(seed, tickRate or None, frameRate, spawnStartingOrganisms, telemetryPath)
+    graphics.initialize(simulation)
+
+    try:
+        while True:
+            snapshot = simulation.receiveSnapshot()
+            # Let the worker pack the next Snapshot while this one is drawn
+            simulation.requestSnapshot()
+            if not graphics.handleEvents():
+                break
+            graphics.draw(snapshot)
+    finally:
+        simulation.stop()
+        graphics.quit()
 
 if __name__ == "__main__":
     print("Starting Ecosystem...")
-    
-    graphics.initialize()
-    
-    world.spawnOrganisms(organism.Plant, config.NUM_STARTING_PLANTS, False)
-    world.spawnOrganisms(organism.Herbivore, config.NUM_STARTING_HERBIVORES, False)
-    world.spawnOrganisms(organism.Carnivore, config.NUM_STARTING_CARNIVORES, False)
-    
-    shouldContinue = True
-    
-    if LOGGING:
-        print("Starting main game loop")
-    while shouldContinue:
-        shouldContinue = graphics.handleEvents(world)
-        graphics.draw()
-        
-        world.doTurn()
-        
-        graphics.advanceClock()
-        # print("In main game loop")
-        
-    graphics.quit()
 
+    arguments = parseArguments()
+
+    if arguments.headless:
+        if arguments.resume:
+            simulation, metadata = checkpoint.loadCheckpoint(arguments.resume)
+            ticksSoFar = metadata.get('tick', 0)
+            print("Resuming from tick", ticksSoFar, "of", arguments.resume)
+        elif arguments.engine == "arrays":
+            # Imported here so that NumPy is only needed for the array engine
+            from arrayworld import ArrayWorld
+            simulation = ArrayWorld(arguments.seed, batched=arguments.batched, threads=arguments.threads)
+            ticksSoFar = 0
+        elif arguments.engine == "tiled":
+            from tiledworld import TiledWorld
+            simulation = TiledWorld(arguments.seed, arguments.tiles)
+            print("Split the world between", simulation.tiles, "processes")
+            ticksSoFar = 0
+        else:
+            simulation = world.World(seed=arguments.seed)
+            ticksSoFar = 0
+
+        if arguments.trace:
+            if not isinstance(simulation, world.World):
+                sys.exit("--trace requires the objects engine")
+            simulation.tracer = tracing.Tracer(arguments.trace_events, tracing.JsonLinesSink(arguments.trace),
+                    tick=ticksSoFar)
+        try:
+            if not arguments.resume:
+                spawnStartingOrganisms(simulation)
+            runHeadless(simulation, arguments.ticks, arguments.save, ticksSoFar, arguments.telemetry,
+                    arguments.profile)
+        finally:
+            if arguments.trace:
+                simulation.tracer.close()
+            if arguments.engine == "tiled":
+                simulation.close()
+    else:
+        runInteractive(arguments.seed, arguments.tick_rate, arguments.frame_rate, arguments.telemetry)
@@ -8,198 +8,203 @@
 #
 
 from util import Location
-from util import LOGGING
 from util import getOrganismsInRadius
-from util import getLivingOrganismsInRadiusWithType
-from util import clip
-import graphics
-import random
-import world
-import config
 import abc # For abstract base class
+from reproduction import sampleReproductionDelay
+import math
+import tracing
 
+# Causes of death, as passed to World.killOrganism
+STARVATION = "starvation"
+PREDATION = "predation"
 
+# The constants shared by every Organism of one type in one World, read from the
+# World's settings once (see World.getTraits) instead of being copied into
+# every Organism.  Constants that don't apply to a type, such as the speed of a
+# Plant, are None.
+class Traits:
+    __slots__ = ('size', 'speed', 'timeToHunger', 'timeToStarvation', 'sightRadius', 'maxEatRadius',
+            'maxTimeBetweenReproduction', 'reproductionRadius', 'maxAttemptsToReproduce',
+            'spawnRingStartingRadius', 'spawnRingMaxRadius', 'spawnRingRadiusIncrement',
+            'reachedLocationTolerance')
+
+    # settings is the config module or a copy of it
+    def __init__(self, settings, organismType):
+        typeSettings = getattr(settings, organismType.__name__)
+        self.size = typeSettings.SIZE
+        self.speed = getattr(typeSettings, 'SPEED', None)
+        self.timeToHunger = getattr(typeSettings, 'TIME_TO_HUNGER', None)
+        self.timeToStarvation = getattr(typeSettings, 'TIME_TO_STARVATION', None)
+        self.sightRadius = getattr(typeSettings, 'SIGHT_RADIUS', None) # The radius within which it can see food
+        self.maxEatRadius = getattr(typeSettings, 'MAX_EAT_RADIUS', None) # The radius within which it can reach food
+        self.maxTimeBetweenReproduction = typeSettings.MAX_TIME_BETWEEN_REPRODUCTION
+        self.reproductionRadius = typeSettings.REPRODUCTION_RADIUS # Radius within which children are created
+        self.maxAttemptsToReproduce = typeSettings.MAX_ATTEMPTS_TO_REPRODUCE
+        self.spawnRingStartingRadius = typeSettings.SPAWN_RING_STARTING_RADIUS
+        self.spawnRingMaxRadius = typeSettings.SPAWN_RING_MAX_RADIUS
+        self.spawnRingRadiusIncrement = typeSettings.SPAWN_RING_RADIUS_INCREMENT
+        self.reachedLocationTolerance = getattr(typeSettings, 'REACHED_LOCATION_TOLERANCE', None)
+
+# Organisms only hold the state that changes over their lives, in __slots__
+# rather than a __dict__, to keep them small.  Everything that's the same for
+# every Organism of a type is in their traits.
 class Organism(metaclass=abc.ABCMeta):
-    def __init__(self, createWithSpawnRing):
+    __slots__ = ('world', 'traits', 'isAlive', 'birthTick', 'location', 'gridCell', 'index', 'hasSpawnRing',
+            'reproductionTick', 'reproductionOrder')
+
+    def __init__(self, world, createWithSpawnRing):
+        self.world = world # The World this Organism lives in
+        self.traits = world.getTraits(type(self))
         self.isAlive = True
-        self.age = 0
+        self.birthTick = world.tick
         self.location = Location(0,0)
+        self.gridCell = None # The world's spatial grid cell containing this Organism
+        self.index = None # Position of this Organism in world.organisms
         self.hasSpawnRing = createWithSpawnRing
-        self.spawnRingRadius = config.Organism.SPAWN_RING_STARTING_RADIUS
+        # Set by the World's ReproductionQueue when the Organism is added
+        self.reproductionTick = None
+        self.reproductionOrder = None
         
-    # Draw the Organism
-    @abc.abstractmethod
-    def draw(self):
-        pass
-      
-    # Draw an expanding ring around a newly spawned Organism to highlight
-    # its location 
-    def drawSpawnRing(self, screen):
-        if self.hasSpawnRing:
-            # TODO: Would it look better if this faded as it expanded?
-            graphics.pygame.draw.circle(
-                    screen,
-                    graphics.COLORS['orange'],
-                    [self.location.x, self.location.y],
-                    self.spawnRingRadius,
-                    config.Organism.SPAWN_RING_WIDTH)
- 
     # Returns an instance of the Organism (a non-abstract subclass).
     # @todo Is there a more pythonic way to do this?
     @abc.abstractmethod
     def createOffspring(self):
         pass
         
-    # Run one unit of time for the organism
-    def doTurn(self):
-        self.age += 1
-        if self.hasSpawnRing: 
-            if self.spawnRingRadius >= config.Organism.SPAWN_RING_MAX_RADIUS:
-                self.hasSpawnRing = False
-                self.spawnRingRadius = 0 
-            else:
-                self.spawnRingRadius += config.Organism.SPAWN_RING_RADIUS_INCREMENT
-        
-        # Returns true if should reproduce this turn, false othewise.
-    def shouldReproduce(self):
-        timeSinceLastReproduction = self.age - self.lastReproductionAge
-        probabilityOfReproduction = min(1.0, timeSinceLastReproduction / self.maxTimeBetweenReproduction)
-        return random.random() < probabilityOfReproduction
-        
-        
+    # Returns the radius of the ring drawn around a newly born Organism, which
+    # grows every tick until it reaches its maximum, or 0 once it's gone.  It's
+    # worked out from the Organism's age, so Plants don't need a turn to grow it.
+    def getSpawnRingRadius(self):
+        if not self.hasSpawnRing:
+            return 0
+        traits = self.traits
+        age = self.world.tick - self.birthTick
+        # The ring grows by one increment a tick and disappears on the tick after
+        # it reaches its maximum
+        if age > 0 and (traits.spawnRingStartingRadius + (age - 1) * traits.spawnRingRadiusIncrement
+                >= traits.spawnRingMaxRadius):
+            self.hasSpawnRing = False
+            return 0
+        return traits.spawnRingStartingRadius + age * traits.spawnRingRadiusIncrement
+
+    # Pick the tick this Organism next reproduces on, counting from the current
+    # one
+    def scheduleReproduction(self):
+        world = self.world
+        world.reproductionQueue.add(self,
+                world.tick + sampleReproductionDelay(world.rng, self.traits.maxTimeBetweenReproduction))
+
+
     # Attempt to place a new Organism at a nearby location.  If it's too crowded
     # to place another Organism, give up after a specified number of attempts.
     def reproduce(self):
         newOrganism = self.createOffspring()
+        traits = self.traits
         attemptsToReproduce = 0
-        while attemptsToReproduce < self.maxAttemptsToReproduce:
-            potentialLocation = world.randomLocationInCircle(self.location, self.reproductionRadius)
-            if LOGGING:
-                print(self, "attempting to reproduce at", potentialLocation)
-            if world.canFit(newOrganism, potentialLocation):
+        while attemptsToReproduce < traits.maxAttemptsToReproduce:
+            potentialLocation = self.world.randomLocationInCircle(self.location, traits.reproductionRadius)
+            if self.world.canFit(newOrganism, potentialLocation):
                 newOrganism = self.createOffspring()
                 newOrganism.location = potentialLocation
-                world.organisms.append(newOrganism)
+                self.world.addOrganism(newOrganism, True)
+                tracer = self.world.tracer
+                if tracer.reproduce:
+                    tracer.record(tracing.REPRODUCE, type(self).__name__, self.location.x, self.location.y,
+                            potentialLocation.x, potentialLocation.y)
                 return
             attemptsToReproduce += 1
         
         
 class Plant(Organism):
-    def __init__(self, createWithSpawnRing):
-        super().__init__(createWithSpawnRing)
-        self.size = config.Plant.SIZE
-        self.lastReproductionAge = 0
-        self.maxTimeBetweenReproduction = config.Plant.MAX_TIME_BETWEEN_REPRODUCTION
-        self.reproductionRadius = config.Plant.REPRODUCTION_RADIUS
-        self.maxAttemptsToReproduce = config.Plant.MAX_ATTEMPTS_TO_REPRODUCE
-        
-    def draw(self):
-        assert self.isAlive
-        self.drawSpawnRing(graphics.screen)
-        graphics.pygame.draw.circle(graphics.screen, graphics.COLORS['green'],
-            [self.location.x, self.location.y], self.size)
-            
-    def doTurn(self):
-        super().doTurn()
-        if LOGGING:
-            print("Age of plant is", self.age, "lastReproductionAge:", self.lastReproductionAge)
-                
-        if self.shouldReproduce():
-            if LOGGING:
-                print("Plant", self, "reproducing")
-            self.lastReproductionAge = self.age
-            self.reproduce()
-        
+    __slots__ = ()
+
     def createOffspring(self):
-        return Plant(False)
+        return Plant(self.world, False)
 
         
 class Animal(Organism):
-    # Take one step in the direction of the Animal's current destination
+    __slots__ = ('destination', 'wanderDestination', 'stepX', 'stepY', 'stepsLeft', 'stepsInGridCell',
+            'timeSinceLastEaten', 'prey')
+
+    def __init__(self, world, createWithSpawnRing):
+        super().__init__(world, createWithSpawnRing)
+        # The Location the Animal wanders to when it isn't chasing prey, which is
+        # moved for each new destination rather than replaced
+        self.wanderDestination = Location(0, 0)
+        self.setDestination(self.getNewDestination())
+        self.timeSinceLastEaten = 0
+        self.prey = None # The Organism the Animal is chasing, if any
+
+    # Returns a new location for the Animal.  This moves wanderDestination, so
+    # the location it returned last time changes too.
+    def getNewDestination(self):
+        return self.world.randomLocation(self.wanderDestination)
+
+    # Head for destination, which may be the Location of another Organism.  The
+    # step toward it is worked out on the Animal's next step, since a new
+    # Animal's location isn't set yet when it gets its first destination.
+    def setDestination(self, destination):
+        self.destination = destination
+        self.stepsLeft = 0
+
+    # Work out the step the Animal takes toward its destination and how many
+    # times it can take it before it changes.  On each axis the Animal moves
+    # speed toward the destination, or the rest of the way once it's within
+    # speed, so the step changes when either axis gets within speed (or gets
+    # there).  The destination mustn't move in the meantime, so an Animal
+    # chasing something that moves has to setDestination every turn.
+    def steer(self):
+        speed = self.traits.speed
+        deltaX = self.destination.x - self.location.x
+        deltaY = self.destination.y - self.location.y
+        self.stepX = max(-speed, min(speed, deltaX))
+        self.stepY = max(-speed, min(speed, deltaY))
+        self.stepsLeft = min(math.ceil(abs(deltaX) / speed) - 1 if abs(deltaX) > speed else 1 if deltaX else math.inf,
+                math.ceil(abs(deltaY) / speed) - 1 if abs(deltaY) > speed else 1 if deltaY else math.inf)
+        self.stepsInGridCell = self.world.stepsInGridCell(self, self.stepX, self.stepY)
+
+    # Take one step in the direction of the Animal's current destination.  The
+    # World is only told about the steps that might take the Animal into another
+    # grid cell.
     def takeStep(self):
-        if abs(self.location.x - self.destination.x) <= self.speed:
-            self.location.x = self.destination.x
+        if not self.stepsLeft:
+            self.steer()
+        self.stepsLeft -= 1
+        location = self.location
+        location.x += self.stepX
+        location.y += self.stepY
+        if self.stepsInGridCell:
+            self.stepsInGridCell -= 1
         else:
-            self.location.x += self.speed if self.location.x < self.destination.x \
-                    else -self.speed if self.location.x > self.destination.x else 0
-        if abs(self.location.y - self.destination.y) <= self.speed:
-            self.location.y = self.destination.y
-        self.location.y += self.speed if self.location.y < self.destination.y \
-                else -self.speed if self.location.y > self.destination.y else 0
+            self.world.organismMoved(self)
+            self.stepsInGridCell = self.world.stepsInGridCell(self, self.stepX, self.stepY)
+        tracer = self.world.tracer
+        if tracer.move:
+            tracer.record(tracing.MOVE, type(self).__name__, self.location.x, self.location.y)
     
     # Returns true if the Animal has arrived at their destination, false otherwise
     def hasArrivedAtDestination(self):
-        return (abs(self.location.x - self.destination.x) < config.Animal.REACHED_LOCATION_TOLERANCE
-                and abs(self.location.y - self.destination.y) < config.Animal.REACHED_LOCATION_TOLERANCE)
+        tolerance = self.traits.reachedLocationTolerance
+        return (abs(self.location.x - self.destination.x) < tolerance
+                and abs(self.location.y - self.destination.y) < tolerance)
     
     # Returns true if the Animal will try to eat if there is food available
     def isHungry(self):
-        return self.timeSinceLastEaten >= self.timeToHunger
+        return self.timeSinceLastEaten >= self.traits.timeToHunger
     
     # End the Animal's life if it has starved
     def dieIfStarved(self):
-        if self.timeSinceLastEaten >= self.timeToStarvation:
+        if self.timeSinceLastEaten >= self.traits.timeToStarvation:
             assert self.isHungry()
-            self.isAlive = False
+            tracer = self.world.tracer
+            if tracer.starve:
+                tracer.record(tracing.STARVE, type(self).__name__, self.location.x, self.location.y)
+            self.world.killOrganism(self, STARVATION)
             
-    def drawStatusBars(self):
-        bottomStatusBarLocation = Location(self.location.x, int(self.location.y - 1.5 * self.size))
-        graphics.drawStatusBar(bottomStatusBarLocation,
-                int(2.0 * self.size),
-                clip((self.timeToStarvation - self.timeSinceLastEaten) / (self.timeToStarvation - self.timeToHunger), 0.0, 1.0))
-        graphics.drawStatusBar(Location(bottomStatusBarLocation.x, int(bottomStatusBarLocation.y - 1.2 * graphics.STATUS_BAR_HEIGHT)),
-                int(2.0 * self.size),
-                clip((self.timeToHunger - self.timeSinceLastEaten) / self.timeToHunger, 0.0, 1.0))
-    
 class Herbivore(Animal):
-    def __init__(self, createWithSpawnRing):
-        super().__init__(createWithSpawnRing)
-        self.size = config.Herbivore.SIZE
-        self.speed = config.Herbivore.SPEED
-        self.destination = self.getNewDestination()
-        self.timeSinceLastEaten = 0
-        self.timeToHunger = config.Herbivore.TIME_TO_HUNGER
-        self.timeToStarvation = config.Herbivore.TIME_TO_STARVATION
-        self.sightRadius = config.Herbivore.SIGHT_RADIUS # The radius within which the Herbivore can see food
-        self.maxEatRadius = config.Herbivore.MAX_EAT_RADIUS # The radius within which the Herbivore can reach food
-        self.prey = None # Is the Herbivore chasing a particular prey organism
-        
-        self.lastReproductionAge = 0
-        self.maxTimeBetweenReproduction = config.Herbivore.MAX_TIME_BETWEEN_REPRODUCTION
-        self.reproductionRadius = config.Herbivore.REPRODUCTION_RADIUS # Radius within which children are created
-        self.maxAttemptsToReproduce = config.Herbivore.MAX_ATTEMPTS_TO_REPRODUCE
-        
-    def draw(self):
-        assert self.isAlive
-        assert self.prey is None or self.isHungry()
-        if self.isHungry() and not self.prey is None:
-            color = graphics.COLORS['blue']
-            graphics.pygame.draw.line(graphics.screen, graphics.COLORS['red'],
-                    [self.location.x, self.location.y],
-                    [self.prey.location.x, self.prey.location.y], 1)
-        elif self.isHungry():
-            # Fade between colors as the Herbivore gets hungrier
-            color = graphics.getTransitionColor(graphics.COLORS['blue'],
-                    graphics.COLORS['grey'],
-                    float(self.timeSinceLastEaten) / self.timeToStarvation)
-        else:
-            color = graphics.COLORS['blue']
-        
-        self.drawSpawnRing(graphics.screen)
-        
-        graphics.pygame.draw.circle(graphics.screen, color,
-            [self.location.x, self.location.y], self.size)
-        self.drawStatusBars()
-            
+    __slots__ = ()
+
     def doTurn(self):
-        super().doTurn()
-        
-        if self.shouldReproduce():
-            if LOGGING:
-                print("Herbivore", self, "reproducing")
-            self.lastReproductionAge = self.age
-            self.reproduce()
-        
         # Stop chasing prey if it's not there anymore
         if not self.prey is None:
             if not self.prey.isAlive:
@@ -214,104 +219,57 @@ class Herbivore(Animal):
                 # If the Herbivore successfully chased down and ate prey, now it needs
                 # something else to do.
                 self.prey = None
-                self.destination = self.getNewDestination()
+                self.setDestination(self.getNewDestination())
             
         if self.isHungry() and (self.prey is None or self.hasArrivedAtDestination()):
             # Look for prey to chase down.
             potentialPrey = self.findPrey()
-            if len(potentialPrey) > 0:
-                self.destination = potentialPrey[0].location
-                self.prey = potentialPrey[0]
+            if potentialPrey is not None:
+                self.setDestination(potentialPrey.location)
+                self.prey = potentialPrey
             else:
                 self.prey = None
                 
         self.dieIfStarved()
                 
         if self.hasArrivedAtDestination():
-            self.destination = self.getNewDestination()
-            
-        if LOGGING:
-            print("Age of Herbivore is", self.age)
+            self.setDestination(self.getNewDestination())
             
-    # Returns a new location for the Herbivore.
-    def getNewDestination(self):
-        return world.randomLocation()
-        
-    # Returns a list of living prey organisms within sight.
+    # Returns the nearest living prey organism within sight, or None if there
+    # isn't one.
     def findPrey(self):
-        return getLivingOrganismsInRadiusWithType(world.organisms, self.location, self.sightRadius, Plant)
+        return self.world.getNearestLivingOrganismWithType(self.location, self.traits.sightRadius, Plant)
                 
-    # If there is a prey Organism within range of this Herbivore, remove it from the world
+    # If there is a prey Organism within range of this Herbivore, remove the nearest one from the world
     # and set this Herbivore's timeSinceLastEaten to 0.
     # Returns True if prey was successfully eaten, False otherwise.
     def tryToEat(self):
-        nearbyOrganisms = getLivingOrganismsInRadiusWithType(world.organisms, self.location, self.maxEatRadius, Plant)
-        if len(nearbyOrganisms) > 0:
+        prey = self.world.getNearestLivingOrganismWithType(self.location, self.traits.maxEatRadius, Plant)
+        if prey is not None:
             # Eat the unfortunate prey
-            nearbyOrganisms[0].isAlive = False
+            tracer = self.world.tracer
+            if tracer.eat:
+                tracer.record(tracing.EAT, type(self).__name__, self.location.x, self.location.y,
+                        type(prey).__name__, prey.location.x, prey.location.y)
+            self.world.killOrganism(prey, PREDATION)
             self.timeSinceLastEaten = 0
             return True
         else:
             return False
     
     def createOffspring(self):
-        return Herbivore(False)
+        return Herbivore(self.world, False)
         
 class Carnivore(Animal):
-    def __init__(self, createWithSpawnRing):
-        super().__init__(createWithSpawnRing)
-        self.size = config.Carnivore.SIZE
-        self.speed = config.Carnivore.SPEED
-        self.destination = self.getNewDestination()
-        self.timeSinceLastEaten = 0
-        self.timeToHunger = config.Carnivore.TIME_TO_HUNGER
-        self.timeToStarvation = config.Carnivore.TIME_TO_STARVATION
-        self.sightRadius = config.Carnivore.SIGHT_RADIUS # The radius within which the Carnivore can see food
-        self.maxEatRadius = config.Carnivore.MAX_EAT_RADIUS # The radius within which the Carnivore can reach food
-        
-        self.lastReproductionAge = 0
-        self.maxTimeBetweenReproduction = config.Carnivore.MAX_TIME_BETWEEN_REPRODUCTION
-        self.reproductionRadius = config.Carnivore.REPRODUCTION_RADIUS # Radius within which children are created
-        self.maxAttemptsToReproduce = config.Carnivore.MAX_ATTEMPTS_TO_REPRODUCE
-        self.prey = None
-    
-    def draw(self):
-        assert self.isAlive
-        assert self.prey is None or self.isHungry()
-        
-        self.drawSpawnRing(graphics.screen)
-        
-        if self.isHungry() and not self.prey is None:
-            color = graphics.COLORS['blue']
-            graphics.pygame.draw.line(graphics.screen, graphics.COLORS['red'],
-                    [self.location.x, self.location.y],
-                    [self.prey.location.x, self.prey.location.y], 1)
-        elif self.isHungry():
-            # Fade between colors as the Carnivore gets hungrier
-            color = graphics.getTransitionColor(graphics.COLORS['blue'],
-                    graphics.COLORS['grey'],
-                    float(self.timeSinceLastEaten) / self.timeToStarvation)
-        else:
-            color = graphics.COLORS['blue']
-        graphics.pygame.draw.circle(graphics.screen, color,
-            [self.location.x, self.location.y], self.size)
-        self.drawStatusBars()
-    
+    __slots__ = ()
+
     def doTurn(self):
-        super().doTurn()
-        
-        if self.shouldReproduce():
-            if LOGGING:
-                print(self.__class__.__name__, self, "reproducing")
-            self.lastReproductionAge = self.age
-            self.reproduce()
-        
         # Continue chasing prey
         if not self.prey is None:
             if not self.prey.isAlive:
                 self.prey = None
             else:
-                self.destination = self.prey.location
+                self.setDestination(self.prey.location)
         
         self.takeStep()
         self.timeSinceLastEaten += 1
@@ -321,14 +279,14 @@ class Carnivore(Animal):
             if atePrey:
                 # If the Carnivore successfully chased down and ate prey, now it needs
                 # something else to do.
-                self.destination = self.getNewDestination()
+                self.setDestination(self.getNewDestination())
             
         if self.isHungry() and (self.prey is None or self.hasArrivedAtDestination()):
             # Look for prey to chase down.
             potentialPrey = self.findPrey()
-            if len(potentialPrey) > 0:
-                self.prey = potentialPrey[0]
-                self.destination = self.prey.location
+            if potentialPrey is not None:
+                self.prey = potentialPrey
+                self.setDestination(self.prey.location)
             else:
                 assert self.prey is None or self.hasArrivedAtDestina
                 self.prey = None
@@ -336,33 +294,31 @@ class Carnivore(Animal):
         self.dieIfStarved()
                 
         if self.hasArrivedAtDestination():
-            self.destination = self.getNewDestination()
-            
-        if LOGGING:
-            print("Age of", self.__class__.__name__, "is", self.age)
+            self.setDestination(self.getNewDestination())
     
-    # If there is a prey Organism within range of this Carnivore, remove it from the world
+    # If there is a prey Organism within range of this Carnivore, remove the nearest one from the world
     # and set this Carnivore's timeSinceLastEaten to 0.
     # Returns True if prey was successfully eaten, False otherwise.
     def tryToEat(self):
-        nearbyOrganisms = getLivingOrganismsInRadiusWithType(world.organisms, self.location, self.maxEatRadius, Herbivore)
-        if len(nearbyOrganisms) > 0:
+        prey = self.world.getNearestLivingOrganismWithType(self.location, self.traits.maxEatRadius, Herbivore)
+        if prey is not None:
             # Eat the unfortunate prey
-            nearbyOrganisms[0].isAlive = False
+            tracer = self.world.tracer
+            if tracer.eat:
+                tracer.record(tracing.EAT, type(self).__name__, self.location.x, self.location.y,
+                        type(prey).__name__, prey.location.x, prey.location.y)
+            self.world.killOrganism(prey, PREDATION)
             self.timeSinceLastEaten = 0
             self.prey = None
             return True
         else:
             return False
     
-    # Returns a new location for the Herbivore.
-    def getNewDestination(self):
-        return world.randomLocation()
-    
-    # Returns a list of living prey organisms within sight.
+    # Returns the nearest living prey organism within sight, or None if there
+    # isn't one.
     def findPrey(self):
-        return getLivingOrganismsInRadiusWithType(world.organisms, self.location, self.sightRadius, Herbivore)
+        return self.world.getNearestLivingOrganismWithType(self.location, self.traits.sightRadius, Herbivore)
     
     def createOffspring(self):
-        return Carnivore(False)
+        return Carnivore(self.world, False)
     
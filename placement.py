@@ -0,0 +1,97 @@
+import math
+
+
+# How many random locations a Placer tries before it decides that the world is
+# crowded and switches to searching it cell by cell
+MAX_RANDOM_ATTEMPTS = 30
+
+
+# Finds free locations for new Organisms of one size.  While the world is mostly
+# empty, random locations almost always fit, so the Placer tries those first.
+# Once they keep failing it searches a grid of small cells in random order,
+# throwing away each cell that turns out to be full.  Every integer location in
+# the world belongs to exactly one cell, so the search always terminates and
+# only reports failure when no location fits at all.
+class Placer:
+    # worldSize is the (width, height) of the world.  size is the SIZE of the
+    # Organisms being placed.  clearance(x, y) returns how far the closest
+    # Organism is from overlapping an Organism of that size at (x, y):  negative
+    # if it overlaps, and at least 0 if the location fits.  randomLocation()
+    # returns a random (x, y) in the world and shuffle(list) shuffles a list in
+    # place; both should use the world's random number generator.
+    # clearanceInBox(left, top, right, bottom), if given, returns a function like
+    # clearance for locations inside that box only, which the cell by cell search
+    # uses to check a whole cell against the same nearby Organisms.  It must agree
+    # with clearance wherever either is negative.
+    def __init__(self, worldSize, size, clearance, randomLocation, shuffle, clearanceInBox=None):
+        self.worldSize = worldSize
+        self.clearance = clearance
+        self.clearanceInBox = clearanceInBox
+        self.randomLocation = randomLocation
+        self.shuffle = shuffle
+        self.cellSide = max(1, int(size))
+        # Half the diagonal of a cell.  No location in a cell is farther than this
+        # from the cell's center.
+        self.cellRadius = math.sqrt(2) * self.cellSide / 2.0
+        # Cells that haven't been found to be full yet, in the order to search
+        # them.  Built the first time random placement fails.
+        self.cells = None
+
+    # Returns an (x, y) where the next Organism fits, or None if there is no room
+    # left anywhere in the world.
+    def findLocation(self):
+        if self.cells is None:
+            for attempt in range(MAX_RANDOM_ATTEMPTS):
+                x, y = self.randomLocation()
+                if self.clearance(x, y) >= 0:
+                    return (x, y)
+            columns = self.worldSize[0] // self.cellSide + 1
+            rows = self.worldSize[1] // self.cellSide + 1
+            self.cells = [(column, row) for column in range(columns) for row in range(rows)]
+            self.shuffle(self.cells)
+
+        while self.cells:
+            location = self.findLocationInCell(*self.cells[-1])
+            if location is not None:
+                # Leave the cell in the list; it may have room for more
+                return location
+            self.cells.pop()
+        return None
+
+    # Returns a location in the given cell where the next Organism fits, or None
+    # if the cell is full.
+    def findLocationInCell(self, column, row):
+        left = column * self.cellSide
+        top = row * self.cellSide
+        right = min(self.worldSize[0], left + self.cellSide - 1)
+        bottom = min(self.worldSize[1], top + self.cellSide - 1)
+
+        # Moving from the center to any other location in the cell changes the
+        # distance to every other Organism by at most cellRadius, so if the center
+        # is blocked by more than that the whole cell is.
+        centerX = (left + right) // 2
+        centerY = (top + bottom) // 2
+        centerClearance = self.clearance(centerX, centerY)
+        if centerClearance >= 0:
+            return (centerX, centerY)
+        if centerClearance < -self.cellRadius:
+            return None
+
+        # A location that is blocked by some amount blocks every location closer to
+        # it than that, so there's no need to check those.  Most cells are settled
+        # by their center, so the batch clearance is only set up past this point.
+        if self.clearanceInBox is None:
+            clearance = self.clearance
+        else:
+            clearance = self.clearanceInBox(left, top, right, bottom)
+        blockedCircles = [(centerX, centerY, centerClearance * centerClearance)]
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                if any((x - blockedX) ** 2 + (y - blockedY) ** 2 < radiusSquared
+                        for blockedX, blockedY, radiusSquared in blockedCircles):
+                    continue
+                locationClearance = clearance(x, y)
+                if locationClearance >= 0:
+                    return (x, y)
+                blockedCircles.append((x, y, locationClearance * locationClearance))
+        return None
@@ -0,0 +1,150 @@
+import time
+import organism
+import world
+
+
+# The phase that all of the others happen inside of:  a whole tick
+TICK = 'tick'
+# Time in a tick that isn't in any of the other phases
+OTHER = 'other'
+
+# The methods that make up each phase of a World's tick, as (phase, owner,
+# method name).  reproduction includes the canFit checks for the children.
+OBJECT_PHASES = ((TICK, world.World, 'doTurn'),
+        ('movement', organism.Animal, 'takeStep'),
+        ('preySearch', organism.Herbivore, 'findPrey'),
+        ('preySearch', organism.Carnivore, 'findPrey'),
+        ('eating', organism.Herbivore, 'tryToEat'),
+        ('eating', organism.Carnivore, 'tryToEat'),
+        ('reproduction', organism.Organism, 'reproduce'),
+        ('purge', world.World, 'purgeDeadOrganisms'))
+
+# Returns the phases of an ArrayWorld's tick in the same form as OBJECT_PHASES.
+# Its methods are timed on the instance rather than the class.  ArrayWorld
+# searches for prey and eats in the same pass, so those two phases are
+# reported together as feeding.
+def arrayPhases(simulation):
+    return ((TICK, simulation, 'doTurn'),
+            ('movement', simulation, 'moveAnimals'),
+            ('feeding', simulation, 'feedAnimals'),
+            ('reproduction', simulation, 'reproduce'),
+            ('purge', simulation, 'purgeDeadOrganisms'))
+
+# Returns lines describing a Profiler.summary(), one per phase and species
+def describeSummary(summary):
+    return ["%-12s %-10s %8.3fms/tick %9.1f calls/tick" % (phase, species, 1000 * secondsPerTick, callsPerTick)
+            for phase, species, secondsPerTick, callsPerTick in summary]
+
+
+# Adds up the wall time and number of calls spent in each phase of a tick, per
+# species, by replacing the methods that make up the phases with timed
+# versions.  Nothing is timed until install() is called, and uninstall() puts
+# the original methods back.  Phases installed on a class are timed for every
+# World in the process, so only one Profiler should be installed at a time.
+#
+# Timing happens inside the simulation rather than from an external profiler,
+# which would distort calls this small far more than two clock reads do.
+class Profiler:
+    def __init__(self):
+        # Maps (phase, Organism class or owner) to [seconds, calls]
+        self.times = {}
+        # (owner, method name, original) for each method replaced.  original is
+        # None for methods replaced on an instance.
+        self.replaced = []
+
+    # Start timing phases, which are in the form of OBJECT_PHASES
+    def install(self, phases=OBJECT_PHASES):
+        assert not self.replaced, "Profiler is already installed"
+        for phase, owner, name in phases:
+            if isinstance(owner, type):
+                original = owner.__dict__[name]
+                setattr(owner, name, self.timeMethod(original, phase))
+            else:
+                original = None
+                setattr(owner, name, self.timeFunction(getattr(owner, name), (phase, type(owner))))
+            self.replaced.append((owner, name, original))
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.replaced):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.replaced.clear()
+
+    # Forget everything timed so far
+    def reset(self):
+        self.times.clear()
+
+    # Returns a version of method that adds its time to the phase for the class
+    # of the object it's called on
+    def timeMethod(self, method, phase):
+        times = self.times
+        perfCounter = time.perf_counter
+        def timedMethod(owner, *args):
+            startTime = perfCounter()
+            try:
+                return method(owner, *args)
+            finally:
+                elapsed = perfCounter() - startTime
+                key = (phase, type(owner))
+                entry = times.get(key)
+                if entry is None:
+                    entry = times[key] = [0.0, 0]
+                entry[0] += elapsed
+                entry[1] += 1
+        return timedMethod
+
+    # Returns a version of function that adds its time to times[key]
+    def timeFunction(self, function, key):
+        entry = self.times.setdefault(key, [0.0, 0])
+        perfCounter = time.perf_counter
+        def timedFunction(*args):
+            startTime = perfCounter()
+            try:
+                return function(*args)
+            finally:
+                entry[0] += perfCounter() - startTime
+                entry[1] += 1
+        return timedFunction
+
+    # Returns the number of ticks timed
+    def countTicks(self):
+        return sum(calls for (phase, owner), (seconds, calls) in self.times.items() if phase == TICK)
+
+    # Returns a dict mapping each phase to the seconds spent in it, over all
+    # species
+    def getPhaseTimes(self):
+        phaseTimes = {}
+        for (phase, owner), (seconds, calls) in self.times.items():
+            phaseTimes[phase] = phaseTimes.get(phase, 0.0) + seconds
+        return phaseTimes
+
+    # Returns a list of [phase, species name, seconds per tick, calls per tick]
+    # for each phase and species timed, followed by the time per tick outside of
+    # all of them (OTHER) and the whole tick (TICK).  The list only contains
+    # numbers and strings, so it can be sent between processes as JSON.
+    def summary(self):
+        ticks = self.countTicks()
+        if ticks == 0:
+            return []
+        rows = []
+        tickSeconds = 0.0
+        phaseSeconds = 0.0
+        for (phase, owner), (seconds, calls) in self.times.items():
+            if phase == TICK:
+                tickSeconds += seconds
+            elif calls:
+                phaseSeconds += seconds
+                rows.append([phase, owner.__name__, seconds / ticks, calls / ticks])
+        rows.sort(key=lambda row: -row[2])
+        rows.append([OTHER, "", max(0.0, tickSeconds - phaseSeconds) / ticks, 0.0])
+        rows.append([TICK, "", tickSeconds / ticks, 1.0])
+        return rows
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.uninstall()
@@ -0,0 +1,84 @@
+import heapq
+import math
+
+
+# An Organism that last reproduced k - 1 ticks ago reproduces this tick with
+# probability min(1, k / maxTimeBetweenReproduction).  Returns the log of the
+# probability that it goes k ticks without reproducing, which is -inf once
+# reproducing is certain.
+def logChanceOfWaiting(maxTimeBetweenReproduction, k):
+    if k >= maxTimeBetweenReproduction:
+        return -math.inf
+    return (math.lgamma(maxTimeBetweenReproduction) - math.lgamma(maxTimeBetweenReproduction - k)
+            - k * math.log(maxTimeBetweenReproduction))
+
+# Returns how many ticks after it last reproduced (or was born) an Organism
+# reproduces next, drawn with one random number from rng from the same
+# distribution as drawing every tick with the probability above would give.
+def sampleReproductionDelay(rng, maxTimeBetweenReproduction):
+    last = math.ceil(maxTimeBetweenReproduction)
+    chance = rng.random()
+    if chance == 0.0:
+        return last
+    target = math.log(chance)
+    # The chance of waiting only goes down, so binary search for the first tick
+    # where it falls below the draw
+    low = 0
+    high = last
+    while high - low > 1:
+        middle = (low + high) // 2
+        if logChanceOfWaiting(maxTimeBetweenReproduction, middle) < target:
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+# The Organisms of a World ordered by the tick they next reproduce on, so that
+# each tick only touches the ones that are due.  Each living Organism has one
+# entry, (tick, order, Organism), where order breaks ties in the order the
+# entries were added.  Organisms that die keep their entry until it comes up or
+# enough of them pile up that the heap is rebuilt without them.
+class ReproductionQueue:
+    def __init__(self, sequence=0):
+        self.entries = []
+        self.sequence = sequence # order of the next entry added
+        self.cancelled = 0 # Entries whose Organism has died
+
+    def __len__(self):
+        return len(self.entries) - self.cancelled
+
+    # Schedule theOrganism to reproduce on tick
+    def add(self, theOrganism, tick):
+        theOrganism.reproductionTick = tick
+        theOrganism.reproductionOrder = self.sequence
+        heapq.heappush(self.entries, (tick, self.sequence, theOrganism))
+        self.sequence += 1
+
+    # Put back Organisms whose reproductionTick and reproductionOrder are already
+    # set, e.g. restored from a checkpoint, all at once
+    def restore(self, organisms):
+        self.entries.extend((theOrganism.reproductionTick, theOrganism.reproductionOrder, theOrganism)
+                for theOrganism in organisms)
+        heapq.heapify(self.entries)
+
+    # Note that an Organism in the queue has died
+    def cancel(self):
+        self.cancelled += 1
+        if self.cancelled > len(self.entries) // 2:
+            self.entries = [entry for entry in self.entries if entry[2].isAlive]
+            heapq.heapify(self.entries)
+            self.cancelled = 0
+
+    # Remove and return the living Organisms due to reproduce on or before tick,
+    # in the order they're due
+    def popDue(self, tick):
+        entries = self.entries
+        due = []
+        while entries and entries[0][0] <= tick:
+            theOrganism = heapq.heappop(entries)[2]
+            if theOrganism.isAlive:
+                due.append(theOrganism)
+            else:
+                self.cancelled -= 1
+        return due
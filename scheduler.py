@@ -0,0 +1,93 @@
+import time
+
+
+# How long the measured tick rate is averaged over, in seconds
+TICK_RATE_WINDOW = 1.0
+
+
+# Returns a short description of how fast a Scheduler is running, such as
+# "x10 200 ticks/s"
+def describeSpeed(isPaused, tickRate, speed, measuredTickRate):
+    if isPaused:
+        return "Paused"
+    return "%s %d ticks/s" % ("max" if tickRate is None else "x%d" % speed, round(measuredTickRate))
+
+
+# Runs the simulation and the display at independent rates.  The simulation
+# advances at a fixed number of ticks per second (times the fast-forward speed),
+# or as fast as it can if tickRate is None, and gets all of the time between
+# frames.  Frames are drawn at frameRate; a frame whose time has already passed
+# by the time the previous one is finished is dropped rather than drawn late.
+# If the simulation can't keep up with its tick rate it runs as fast as it can
+# without building up a backlog of ticks to catch up on later.
+class Scheduler:
+    def __init__(self, tickRate, frameRate, clock=time.perf_counter, sleep=time.sleep):
+        assert tickRate is None or tickRate > 0
+        assert frameRate > 0
+        self.tickRate = tickRate
+        self.frameRate = frameRate
+        self.clock = clock
+        self.sleep = sleep
+        self.speed = 1
+        self.isPaused = False
+        self.ticks = 0 # Ticks simulated so far
+        self.frames = 0 # Frames drawn so far
+        self.droppedFrames = 0
+        self.measuredTickRate = 0.0 # Ticks per second actually simulated lately
+
+    def togglePause(self):
+        self.isPaused = not self.isPaused
+
+    def setSpeed(self, speed):
+        assert speed > 0
+        self.speed = speed
+
+    # Run until handleEvents() returns false.  doTurn() advances the simulation
+    # one tick and drawFrame() draws it.
+    def run(self, doTurn, handleEvents, drawFrame):
+        clock = self.clock
+        frameInterval = 1.0 / self.frameRate
+        now = clock()
+        nextFrameTime = now
+        nextTickTime = now
+        measureStartTime = now
+        measureStartTicks = self.ticks
+
+        while handleEvents():
+            drawFrame()
+            self.frames += 1
+
+            # Skip the frames whose time has already passed
+            nextFrameTime += frameInterval
+            now = clock()
+            if nextFrameTime <= now:
+                missedFrames = int((now - nextFrameTime) / frameInterval) + 1
+                self.droppedFrames += missedFrames
+                nextFrameTime += missedFrames * frameInterval
+
+            if now - measureStartTime >= TICK_RATE_WINDOW:
+                self.measuredTickRate = (self.ticks - measureStartTicks) / (now - measureStartTime)
+                measureStartTime = now
+                measureStartTicks = self.ticks
+
+            # Don't let time spent paused, or time the simulation couldn't keep up
+            # with, turn into ticks that have to be made up later.  At most a
+            # frame's worth of ticks can be overdue.
+            if self.isPaused or self.tickRate is None:
+                nextTickTime = now
+            else:
+                tickInterval = 1.0 / (self.tickRate * self.speed)
+                nextTickTime = max(nextTickTime, now - max(tickInterval, frameInterval))
+
+            # Simulate until the next frame is due
+            while now < nextFrameTime:
+                if self.isPaused:
+                    self.sleep(nextFrameTime - now)
+                elif self.tickRate is None or now >= nextTickTime:
+                    doTurn()
+                    self.ticks += 1
+                    if self.tickRate is not None:
+                        nextTickTime += tickInterval
+                else:
+                    self.sleep(min(nextFrameTime, nextTickTime) - now)
+                now = clock()
@@ -0,0 +1,89 @@
+import array
+import json
+import struct
+import organism
+import scheduler
+
+
+# The organism types in a snapshot, indexed by their species number
+SPECIES = (organism.Plant, organism.Herbivore, organism.Carnivore)
+PLANT, HERBIVORE, CARNIVORE = range(len(SPECIES))
+
+# preyX of an Organism that isn't chasing anything
+NO_PREY = -1
+
+# tick, number of organisms, number of each species, then how the Scheduler is
+# running the World:  isPaused, tickRate (0 when running flat out), speed and the
+# measured tick rate, then the length of the profile that follows the columns
+# (0 if the World isn't being profiled)
+HEADER = struct.Struct("<qi3i?dIdI")
+
+# The values stored for every Organism, as (name, array typecode).  Each is
+# stored as one column, one after another after the header.  spawnRingRadius is
+# 0 when there is no spawn ring, and Plants have a timeSinceLastEaten of 0.
+COLUMNS = (('x', 'i'),
+        ('y', 'i'),
+        ('spawnRingRadius', 'i'),
+        ('timeSinceLastEaten', 'i'),
+        ('preyX', 'i'),
+        ('preyY', 'i'),
+        ('species', 'b'))
+
+# Returns the bytes of a snapshot of everything needed to draw world, which is
+# being run by theScheduler.  profile is a Profiler.summary() of the World, if
+# it's being profiled.
+def packSnapshot(world, theScheduler, profile=None):
+    speciesNumbers = {organismType: number for number, organismType in enumerate(SPECIES)}
+    columns = [array.array(typecode) for name, typecode in COLUMNS]
+    x, y, spawnRingRadius, timeSinceLastEaten, preyX, preyY, species = columns
+    for theOrganism in world.organisms:
+        location = theOrganism.location
+        x.append(location.x)
+        y.append(location.y)
+        spawnRingRadius.append(theOrganism.getSpawnRingRadius() if theOrganism.hasSpawnRing else 0)
+        species.append(speciesNumbers[type(theOrganism)])
+        if isinstance(theOrganism, organism.Animal):
+            timeSinceLastEaten.append(theOrganism.timeSinceLastEaten)
+            prey = theOrganism.prey
+            if prey is None:
+                preyX.append(NO_PREY)
+                preyY.append(NO_PREY)
+            else:
+                preyX.append(prey.location.x)
+                preyY.append(prey.location.y)
+        else:
+            timeSinceLastEaten.append(0)
+            preyX.append(NO_PREY)
+            preyY.append(NO_PREY)
+
+    profileBytes = b"" if profile is None else json.dumps(profile).encode()
+    header = HEADER.pack(theScheduler.ticks, len(x),
+            *(world.countOrganisms(organismType) for organismType in SPECIES),
+            theScheduler.isPaused, theScheduler.tickRate or 0, theScheduler.speed,
+            theScheduler.measuredTickRate, len(profileBytes))
+    return header + b"".join(column.tobytes() for column in columns) + profileBytes
+
+# An immutable view of a World at one tick, read from the bytes made by
+# packSnapshot without copying them.  Each column in COLUMNS is an attribute
+# that can be indexed by Organism.  profile is the Profiler.summary() packed
+# with it, or None.
+class Snapshot:
+    def __init__(self, data):
+        (self.tick, self.count, plants, herbivores, carnivores, self.isPaused, tickRate,
+                self.speed, self.measuredTickRate, profileLength) = HEADER.unpack_from(data)
+        self.populations = (plants, herbivores, carnivores)
+        self.tickRate = tickRate or None
+        view = memoryview(data)
+        offset = HEADER.size
+        for name, typecode in COLUMNS:
+            size = array.array(typecode).itemsize * self.count
+            setattr(self, name, view[offset:offset + size].cast(typecode))
+            offset += size
+        self.profile = json.loads(bytes(view[offset:offset + profileLength])) if profileLength else None
+
+    def countOrganisms(self, organismType):
+        return self.populations[SPECIES.index(organismType)]
+
+    # Returns a short description of how fast the World is being run
+    def describeSpeed(self):
+        return scheduler.describeSpeed(self.isPaused, self.tickRate, self.speed, self.measuredTickRate)
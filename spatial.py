@@ -0,0 +1,199 @@
+import math
+
+
+# Yields the (column, row) of each cell in the square ring of cells that are
+# ring cells away from (column, row), row by row.  Ring 0 is just that cell.
+def cellsInRing(column, row, ring):
+    if ring == 0:
+        yield (column, row)
+        return
+    for ringColumn in range(column - ring, column + ring + 1):
+        yield (ringColumn, row - ring)
+    for ringRow in range(row - ring + 1, row + ring):
+        yield (column - ring, ringRow)
+        yield (column + ring, ringRow)
+    for ringColumn in range(column - ring, column + ring + 1):
+        yield (ringColumn, row + ring)
+
+
+# A uniform grid that buckets Organisms by location so that proximity queries
+# only have to look at the cells around the point of interest instead of at
+# every Organism in the world.
+class SpatialGrid:
+    def __init__(self, cellSize):
+        assert cellSize > 0
+        self.cellSize = cellSize
+        # Maps (column, row) to the Organisms in that cell.  The buckets are dicts
+        # used as insertion-ordered sets so that removal is O(1) and iteration
+        # order doesn't depend on object ids.
+        self.cells = {}
+
+    # Returns the (column, row) of the cell containing location
+    def cellFor(self, location):
+        return (int(location.x // self.cellSize), int(location.y // self.cellSize))
+
+    def insert(self, organism):
+        cell = self.cellFor(organism.location)
+        organism.gridCell = cell
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            bucket = self.cells[cell] = {}
+        bucket[organism] = None
+
+    def remove(self, organism):
+        bucket = self.cells[organism.gridCell]
+        del bucket[organism]
+        if not bucket:
+            del self.cells[organism.gridCell]
+        organism.gridCell = None
+
+    # Returns how many steps of (stepX, stepY) something can take from location
+    # and still be in the cell containing it.  This errs low by a step, so that
+    # rounding can't make it miss a move into another cell.
+    def stepsInCell(self, location, stepX, stepY):
+        cellSize = self.cellSize
+        steps = math.inf
+        for position, step in ((location.x, stepX), (location.y, stepY)):
+            cellStart = (position // cellSize) * cellSize
+            if step > 0:
+                steps = min(steps, math.ceil((cellStart + cellSize - position) / step) - 2)
+            elif step < 0:
+                steps = min(steps, math.floor((position - cellStart) / -step) - 1)
+        return max(0, steps)
+
+    # Must be called whenever an Organism in the grid changes its location.
+    def move(self, organism):
+        if self.cellFor(organism.location) != organism.gridCell:
+            self.remove(organism)
+            self.insert(organism)
+
+    # Yields every Organism in the cells overlapping the square that bounds the
+    # circle with the given center Location and radius.  Callers still have to
+    # check the actual distance.
+    def getOrganismsNear(self, location, radius):
+        cellSize = self.cellSize
+        minColumn = int(math.floor((location.x - radius) / cellSize))
+        maxColumn = int(math.floor((location.x + radius) / cellSize))
+        minRow = int(math.floor((location.y - radius) / cellSize))
+        maxRow = int(math.floor((location.y + radius) / cellSize))
+        cells = self.cells
+        for column in range(minColumn, maxColumn + 1):
+            for row in range(minRow, maxRow + 1):
+                bucket = cells.get((column, row))
+                if bucket is not None:
+                    yield from bucket
+
+    # Yields every Organism in the cells overlapping the box from (left, top) to
+    # (right, bottom).  Batch queries use this to gather the Organisms near a
+    # group of centers once and test every center against the same candidates.
+    def getOrganismsInBox(self, left, top, right, bottom):
+        cellSize = self.cellSize
+        cells = self.cells
+        for column in range(int(math.floor(left / cellSize)), int(math.floor(right / cellSize)) + 1):
+            for row in range(int(math.floor(top / cellSize)), int(math.floor(bottom / cellSize)) + 1):
+                bucket = cells.get((column, row))
+                if bucket is not None:
+                    yield from bucket
+
+    # Yields every Organism within radius of (x, y), in the same order as
+    # getOrganismsNear.  The cells overlapping the bounding square rule out
+    # everything else, and distances are compared squared so there are no square
+    # roots.  Skipping the cells at the corners of the square costs more than it
+    # saves at the densities the World runs at.
+    def getOrganismsWithin(self, x, y, radius):
+        cellSize = self.cellSize
+        radiusSquared = radius * radius
+        cells = self.cells
+        minRow = int((y - radius) // cellSize)
+        maxRow = int((y + radius) // cellSize)
+        for column in range(int((x - radius) // cellSize), int((x + radius) // cellSize) + 1):
+            for row in range(minRow, maxRow + 1):
+                bucket = cells.get((column, row))
+                if bucket is not None:
+                    for organism in bucket:
+                        location = organism.location
+                        deltaX = location.x - x
+                        deltaY = location.y - y
+                        if deltaX * deltaX + deltaY * deltaY <= radiusSquared:
+                            yield organism
+
+    # Returns true if any Organism is closer than distance to (x, y).  Stops at
+    # the first one found.
+    def hasOrganismCloserThan(self, x, y, distance):
+        cellSize = self.cellSize
+        distanceSquared = distance * distance
+        cells = self.cells
+        minRow = int((y - distance) // cellSize)
+        maxRow = int((y + distance) // cellSize)
+        for column in range(int((x - distance) // cellSize), int((x + distance) // cellSize) + 1):
+            for row in range(minRow, maxRow + 1):
+                bucket = cells.get((column, row))
+                if bucket is not None:
+                    for organism in bucket:
+                        location = organism.location
+                        deltaX = location.x - x
+                        deltaY = location.y - y
+                        if deltaX * deltaX + deltaY * deltaY < distanceSquared:
+                            return True
+        return False
+
+    # Returns how far the closest Organism is from being within reach of (x, y):
+    # its distance minus reach, which is negative if it's within reach.  Only
+    # the cells overlapping the square that bounds the reach are searched, so the
+    # result is infinite if there's nothing near, and otherwise only exact
+    # where it's negative.
+    def getClearance(self, x, y, reach):
+        cellSize = self.cellSize
+        cells = self.cells
+        hypot = math.hypot
+        clearance = float("inf")
+        minRow = int((y - reach) // cellSize)
+        maxRow = int((y + reach) // cellSize)
+        for column in range(int((x - reach) // cellSize), int((x + reach) // cellSize) + 1):
+            for row in range(minRow, maxRow + 1):
+                bucket = cells.get((column, row))
+                if bucket is not None:
+                    for organism in bucket:
+                        location = organism.location
+                        organismClearance = hypot(location.x - x, location.y - y) - reach
+                        if organismClearance < clearance:
+                            clearance = organismClearance
+        return clearance
+
+    # Returns the Organism nearest to (x, y) within radius of it, or None if
+    # there isn't one.  Cells are searched in rings around the one containing (x,
+    # y), and the search stops as soon as the next ring is too far away to hold
+    # anything closer than what has been found, so a dense neighborhood is
+    # settled after a ring or two.  Of Organisms at the same distance, the first
+    # found wins, so the result only depends on the contents of the grid.
+    def getNearest(self, x, y, radius):
+        cellSize = self.cellSize
+        cells = self.cells
+        column = int(x // cellSize)
+        row = int(y // cellSize)
+        # Everything in ring k is at least this plus k - 1 cells away
+        edgeGap = min(x - column * cellSize, (column + 1) * cellSize - x,
+                y - row * cellSize, (row + 1) * cellSize - y)
+        nearest = None
+        nearestDistanceSquared = radius * radius
+        ring = 0
+        while True:
+            for cell in cellsInRing(column, row, ring):
+                bucket = cells.get(cell)
+                if bucket is not None:
+                    for organism in bucket:
+                        location = organism.location
+                        deltaX = location.x - x
+                        deltaY = location.y - y
+                        distanceSquared = deltaX * deltaX + deltaY * deltaY
+                        if distanceSquared < nearestDistanceSquared or \
+                                (distanceSquared == nearestDistanceSquared and nearest is None):
+                            nearest = organism
+                            nearestDistanceSquared = distanceSquared
+            ring += 1
+            ringGap = edgeGap + (ring - 1) * cellSize
+            if ringGap * ringGap > nearestDistanceSquared:
+                return nearest
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.cells.values())
@@ -0,0 +1,129 @@
+import pygame
+import graphics
+import snapshot
+from util import Location, clip
+
+
+# How many different colors a hungry Animal fades through on its way from blue
+# to grey
+HUNGER_COLOR_BUCKETS = 32
+
+# The color sprites are filled with where they should be see-through.  Nothing
+# in the ecosystem is drawn in it.
+TRANSPARENT = (255, 0, 255)
+
+
+# Draws the Organisms in a Snapshot by copying pre-rendered sprites to the
+# screen in one Surface.blits call, instead of making several pygame.draw calls for each of
+# them every frame.  Each sprite is rendered with the pygame.draw calls the first
+# time something needs it and then reused, and since Organisms sit on whole
+# pixels the copies look exactly like drawing them directly.
+class SpriteRenderer:
+    def __init__(self, settings):
+        self.settings = settings
+        # Maps an appearance to its sprite, which is a (surface, x offset,
+        # y offset) tuple.  The surface should be blitted at the offset from the
+        # center of the Organism.
+        self.sprites = {}
+        # Maps (species, timeSinceLastEaten, isChasingPrey) to the sprite of an
+        # Animal in that state, so that working out its appearance only happens
+        # the first time it's seen
+        self.animalSprites = {}
+
+    # Returns the sprite for key, rendering it with draw(surface, x, y) if it
+    # hasn't been rendered yet.  draw must draw the image centered on (x, y),
+    # staying within radius pixels of it, and return the Rect it drew.
+    def getSprite(self, key, radius, draw):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            scratch = pygame.Surface((2 * radius + 1, 2 * radius + 1))
+            scratch.fill(TRANSPARENT)
+            rect = draw(scratch, radius, radius)
+            surface = scratch.subsurface(rect).convert()
+            surface.set_colorkey(TRANSPARENT, pygame.RLEACCEL)
+            sprite = self.sprites[key] = (surface, rect.x - radius, rect.y - radius)
+        return sprite
+
+    def getPlantSprite(self):
+        size = self.settings.Plant.SIZE
+        def draw(surface, x, y):
+            return pygame.draw.circle(surface, graphics.COLORS['green'], [x, y], size)
+        return self.getSprite(('Plant', size), size + 1, draw)
+
+    # Returns the sprite of an expanding spawn ring
+    def getSpawnRingSprite(self, ringRadius):
+        ringWidth = self.settings.Organism.SPAWN_RING_WIDTH
+        def draw(surface, x, y):
+            return pygame.draw.circle(surface, graphics.COLORS['orange'], [x, y], ringRadius, ringWidth)
+        return self.getSprite(('SpawnRing', ringRadius, ringWidth), ringRadius + ringWidth, draw)
+
+    # Returns the sprite of an Animal's body together with its starvation and
+    # hunger status bars
+    def getAnimalSprite(self, species, timeSinceLastEaten, isChasingPrey):
+        key = (species, timeSinceLastEaten, isChasingPrey)
+        sprite = self.animalSprites.get(key)
+        if sprite is not None:
+            return sprite
+
+        settings = getattr(self.settings, snapshot.SPECIES[species].__name__)
+        timeToHunger = settings.TIME_TO_HUNGER
+        timeToStarvation = settings.TIME_TO_STARVATION
+        if timeSinceLastEaten >= timeToHunger and not isChasingPrey:
+            # Fade between colors as the Animal gets hungrier
+            colorBucket = min(HUNGER_COLOR_BUCKETS,
+                    int(HUNGER_COLOR_BUCKETS * timeSinceLastEaten / timeToStarvation))
+        else:
+            colorBucket = 0
+        color = graphics.getTransitionColor(graphics.COLORS['blue'], graphics.COLORS['grey'],
+                float(colorBucket) / HUNGER_COLOR_BUCKETS)
+
+        size = settings.SIZE
+        barWidth = int(2.0 * size)
+        starvationFill = int(barWidth * clip((timeToStarvation - timeSinceLastEaten)
+                / (timeToStarvation - timeToHunger), 0.0, 1.0))
+        hungerFill = int(barWidth * clip((timeToHunger - timeSinceLastEaten) / timeToHunger, 0.0, 1.0))
+
+        def draw(surface, x, y):
+            rect = pygame.draw.circle(surface, color, [x, y], size)
+            bottomStatusBarLocation = Location(x, int(y - 1.5 * size))
+            rect.union_ip(graphics.drawStatusBar(surface, bottomStatusBarLocation, barWidth, starvationFill))
+            rect.union_ip(graphics.drawStatusBar(surface, Location(bottomStatusBarLocation.x,
+                    int(bottomStatusBarLocation.y - 1.2 * graphics.STATUS_BAR_HEIGHT)), barWidth, hungerFill))
+            return rect
+        sprite = self.getSprite(('Animal', size, colorBucket, barWidth, starvationFill, hungerFill),
+                2 * size + 3 * graphics.STATUS_BAR_HEIGHT, draw)
+        self.animalSprites[key] = sprite
+        return sprite
+
+    # Draw the Organisms in theSnapshot onto surface and return the Rects drawn
+    def draw(self, surface, theSnapshot):
+        rects = []
+        blitSequence = []
+        addBlit = blitSequence.append
+        animalSprites = self.animalSprites
+        preyLineColor = graphics.COLORS['red']
+        plantSprite = self.getPlantSprite()
+        PLANT = snapshot.PLANT
+        NO_PREY = snapshot.NO_PREY
+        for x, y, spawnRingRadius, timeSinceLastEaten, preyX, preyY, species in zip(theSnapshot.x,
+                theSnapshot.y, theSnapshot.spawnRingRadius, theSnapshot.timeSinceLastEaten,
+                theSnapshot.preyX, theSnapshot.preyY, theSnapshot.species):
+            if spawnRingRadius:
+                ringSurface, offsetX, offsetY = self.getSpawnRingSprite(spawnRingRadius)
+                addBlit((ringSurface, (x + offsetX, y + offsetY)))
+
+            if species == PLANT:
+                sprite = plantSprite
+            else:
+                isChasingPrey = preyX != NO_PREY
+                sprite = animalSprites.get((species, timeSinceLastEaten, isChasingPrey))
+                if sprite is None:
+                    sprite = self.getAnimalSprite(species, timeSinceLastEaten, isChasingPrey)
+                if isChasingPrey:
+                    # Lines can't be sprites, but they go under everything else
+                    rects.append(pygame.draw.line(surface, preyLineColor, [x, y], [preyX, preyY], 1))
+            spriteSurface, offsetX, offsetY = sprite
+            addBlit((spriteSurface, (x + offsetX, y + offsetY)))
+
+        rects.extend(surface.blits(blitSequence))
+        return rects
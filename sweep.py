@@ -0,0 +1,195 @@
+#!/usr/bin/python
+#
+#    sweep.py
+#    Ecosystem
+#
+#    Runs many independent headless simulations with different config values
+#    across a pool of processes and collects their population time series and
+#    extinction times into one JSON Lines results file, one run per line.  Each
+#    run has its own World and its own copy of config.
+#
+#    Config values are named by their path in config.py, e.g.
+#
+#        python sweep.py --grid Herbivore.TIME_TO_STARVATION=[300,400,500] \
+#                --grid Herbivore.SIGHT_RADIUS=[30,50,70] --repeats 3 \
+#                --ticks 20000 --output sweep.jsonl
+#
+#        python sweep.py --sample 100 --range Carnivore.SIGHT_RADIUS=40:100 \
+#                --range Plant.MAX_TIME_BETWEEN_REPRODUCTION=20000:80000
+#
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import time
+import config
+import organism
+import world
+
+ORGANISM_TYPES = (organism.Plant, organism.Herbivore, organism.Carnivore)
+
+# Returns (owner, attribute name) for a config path such as "Herbivore.SIZE" in
+# settings (the config module or a copy of it)
+def resolveConfigPath(path, settings=config):
+    owner = settings
+    names = path.split(".")
+    for name in names[:-1]:
+        owner = getattr(owner, name)
+    if not hasattr(owner, names[-1]):
+        raise AttributeError("config has no setting " + path)
+    return owner, names[-1]
+
+# Set each value in overrides, which maps config paths to values, in settings
+def applyOverrides(settings, overrides):
+    for path, value in overrides.items():
+        owner, name = resolveConfigPath(path, settings)
+        # JSON has no tuples, but settings like WORLD_SIZE are tuples
+        setattr(owner, name, tuple(value) if isinstance(value, list) else value)
+
+def parseAssignment(text):
+    if "=" not in text:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE, got " + repr(text))
+    path, value = text.split("=", 1)
+    try:
+        resolveConfigPath(path)
+    except AttributeError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return path, value
+
+def parseGridValues(text):
+    path, value = parseAssignment(text)
+    values = json.loads(value)
+    if not isinstance(values, list) or len(values) == 0:
+        raise argparse.ArgumentTypeError(path + " needs a non-empty JSON list of values")
+    return path, values
+
+def parseRange(text):
+    path, value = parseAssignment(text)
+    low, high = (json.loads(bound) for bound in value.split(":"))
+    return path, (low, high)
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Run headless simulations over a sweep of config values.")
+    parser.add_argument("--grid", type=parseGridValues, action="append", default=[], metavar="NAME=[V1,V2,...]",
+            help="try every value in the JSON list for the config setting NAME; "
+            "runs cover every combination of --grid settings")
+    parser.add_argument("--range", type=parseRange, action="append", default=[], metavar="NAME=LOW:HIGH",
+            help="draw NAME uniformly from [LOW, HIGH] (integers if both bounds are) for --sample runs")
+    parser.add_argument("--sample", type=int, default=0, metavar="N",
+            help="run N random combinations of the --range settings (combined with every --grid combination)")
+    parser.add_argument("--repeats", type=int, default=1,
+            help="runs with different seeds for each combination of settings (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=10000,
+            help="maximum ticks per run (default: %(default)s)")
+    parser.add_argument("--record-every", type=int, default=10, metavar="TICKS",
+            help="record populations every TICKS ticks (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0,
+            help="seed for the first run; run i uses seed + i (default: %(default)s)")
+    parser.add_argument("--engine", choices=("objects", "arrays"), default="objects",
+            help="simulate with the Organism classes or the NumPy ArrayWorld")
+    parser.add_argument("--processes", type=int, default=None,
+            help="number of worker processes (default: one per core)")
+    parser.add_argument("--output", default="sweep.jsonl",
+            help="JSON Lines file to write results to (default: %(default)s)")
+    arguments = parser.parse_args()
+    if arguments.range and arguments.sample <= 0:
+        parser.error("--range needs --sample")
+    return arguments
+
+# Returns the list of override dicts, one per combination of settings to run
+def buildOverrides(arguments):
+    gridPaths = [path for path, values in arguments.grid]
+    gridCombinations = [dict(zip(gridPaths, values))
+            for values in itertools.product(*(values for path, values in arguments.grid))]
+    if arguments.sample <= 0:
+        return gridCombinations
+
+    # Sample with a separate generator so the sample only depends on --seed
+    sampler = random.Random(arguments.seed)
+    overrides = []
+    for gridCombination in gridCombinations:
+        for sample in range(arguments.sample):
+            combination = dict(gridCombination)
+            for path, (low, high) in arguments.range:
+                if isinstance(low, int) and isinstance(high, int):
+                    combination[path] = sampler.randint(low, high)
+                else:
+                    combination[path] = sampler.uniform(low, high)
+            overrides.append(combination)
+    return overrides
+
+# Runs one simulation.  Each run gets its own World and its own copy of config,
+# so runs never affect each other even when a worker process is reused.
+def runSimulation(run):
+    settings = config.copy()
+    applyOverrides(settings, run['overrides'])
+    if run['engine'] == "arrays":
+        from arrayworld import ArrayWorld
+        simulation = ArrayWorld(run['seed'], settings=settings)
+    else:
+        simulation = world.World(settings, run['seed'])
+
+    startTime = time.perf_counter()
+    simulation.spawnOrganisms(organism.Plant, settings.NUM_STARTING_PLANTS, False)
+    simulation.spawnOrganisms(organism.Herbivore, settings.NUM_STARTING_HERBIVORES, False)
+    simulation.spawnOrganisms(organism.Carnivore, settings.NUM_STARTING_CARNIVORES, False)
+
+    names = [organismType.__name__ for organismType in ORGANISM_TYPES]
+    recordedTicks = []
+    populations = {name: [] for name in names}
+    extinctionTick = {name: None for name in names}
+    tick = 0
+    while True:
+        counts = [simulation.countOrganisms(organismType) for organismType in ORGANISM_TYPES]
+        for name, count in zip(names, counts):
+            if count == 0 and extinctionTick[name] is None:
+                extinctionTick[name] = tick
+        isFinished = tick == run['ticks'] or not any(counts)
+        if tick % run['recordEvery'] == 0 or isFinished:
+            recordedTicks.append(tick)
+            for name, count in zip(names, counts):
+                populations[name].append(count)
+        if isFinished:
+            break
+        simulation.doTurn()
+        tick += 1
+
+    return {
+        'run': run['run'],
+        'overrides': run['overrides'],
+        'seed': run['seed'],
+        'engine': run['engine'],
+        'ticks': tick,
+        'seconds': time.perf_counter() - startTime,
+        'extinctionTick': extinctionTick,
+        'recordedTicks': recordedTicks,
+        'populations': populations,
+    }
+
+if __name__ == "__main__":
+    arguments = parseArguments()
+
+    runs = []
+    for overrides in buildOverrides(arguments):
+        for repeat in range(arguments.repeats):
+            runs.append({
+                'run': len(runs),
+                'overrides': overrides,
+                'seed': arguments.seed + len(runs),
+                'engine': arguments.engine,
+                'ticks': arguments.ticks,
+                'recordEvery': arguments.record_every,
+            })
+
+    print("Running", len(runs), "simulations...")
+    startTime = time.perf_counter()
+    with open(arguments.output, "w") as resultsFile:
+        with multiprocessing.Pool(arguments.processes) as pool:
+            for finished, result in enumerate(pool.imap_unordered(runSimulation, runs), 1):
+                resultsFile.write(json.dumps(result) + "\n")
+                resultsFile.flush()
+                print("[%d/%d] run %d finished after %d ticks in %.1fs" % (
+                        finished, len(runs), result['run'], result['ticks'], result['seconds']))
+    print("Wrote", arguments.output, "in %.1fs" % (time.perf_counter() - startTime))
@@ -0,0 +1,112 @@
+import csv
+import time
+import organism
+
+
+# The organism types and causes of death that are recorded, in column order
+ORGANISM_TYPES = (organism.Plant, organism.Herbivore, organism.Carnivore)
+CAUSES_OF_DEATH = (organism.STARVATION, organism.PREDATION)
+
+# How many ticks are kept in memory before they're written to the file
+FLUSH_EVERY = 500
+
+
+# Returns the names of the columns of a telemetry file, in order
+def columnNames():
+    names = ['tick', 'tickSeconds']
+    for organismType in ORGANISM_TYPES:
+        prefix = organismType.__name__.lower()
+        names.append(prefix + 'Population')
+        names.append(prefix + 'Births')
+        names.extend(prefix + cause.capitalize() + 'Deaths' for cause in CAUSES_OF_DEATH)
+        if issubclass(organismType, organism.Animal):
+            names.append(prefix + 'MeanHunger')
+    return names
+
+
+# Records statistics about every tick of a World or ArrayWorld to a CSV file:
+# the population of each species, how many were born and how many starved or
+# were eaten during the tick, how close the Animals are to starving on average
+# and how long the tick took.  Rows are buffered in memory and written FLUSH_EVERY
+# ticks at a time, and the file is only ever appended to, so a resumed run can
+# keep adding to the file of the run it continues.
+#
+# Recording only reads counters the World keeps up to date anyway, plus one
+# pass over the Animals for their hunger, so it can be left on for every run.
+class TelemetryRecorder:
+    # tick is the number of ticks simulation has already run
+    def __init__(self, simulation, path, tick=0, flushEvery=FLUSH_EVERY):
+        self.simulation = simulation
+        self.tick = tick
+        self.flushEvery = flushEvery
+        self.rows = []
+        self.lastTotals = self.countTotals()
+
+        names = columnNames()
+        self.file = open(path, 'a+', newline='')
+        if self.file.tell() == 0:
+            csv.writer(self.file).writerow(names)
+        else:
+            self.file.seek(0)
+            existingNames = next(csv.reader(self.file), None)
+            if existingNames != names:
+                self.file.close()
+                raise ValueError(path + " has different columns than a telemetry file")
+            self.file.seek(0, 2) # Back to the end to append
+        self.writer = csv.writer(self.file)
+
+    # Returns the births and deaths by cause of each species so far, in column
+    # order
+    def countTotals(self):
+        totals = []
+        for organismType in ORGANISM_TYPES:
+            totals.append(self.simulation.countBirths(organismType))
+            for cause in CAUSES_OF_DEATH:
+                totals.append(self.simulation.countDeaths(organismType, cause))
+        return totals
+
+    # Run one tick of the simulation and record it.  This can be passed anywhere
+    # simulation.doTurn would be.
+    def doTurn(self):
+        startTime = time.perf_counter()
+        self.simulation.doTurn()
+        self.record(time.perf_counter() - startTime)
+
+    # Record the tick that was just run, which took tickSeconds
+    def record(self, tickSeconds):
+        self.tick += 1
+        simulation = self.simulation
+        totals = self.countTotals()
+        lastTotals = self.lastTotals
+        row = [self.tick, "%.6f" % tickSeconds]
+        column = 0
+        for organismType in ORGANISM_TYPES:
+            row.append(simulation.countOrganisms(organismType))
+            for i in range(1 + len(CAUSES_OF_DEATH)):
+                row.append(totals[column] - lastTotals[column])
+                column += 1
+            if issubclass(organismType, organism.Animal):
+                meanHunger = simulation.meanHunger(organismType)
+                row.append("" if meanHunger is None else "%.4f" % meanHunger)
+        self.lastTotals = totals
+
+        self.rows.append(row)
+        if len(self.rows) >= self.flushEvery:
+            self.flush()
+
+    # Write the buffered rows to the file
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
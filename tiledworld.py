@@ -0,0 +1,684 @@
+import math
+import multiprocessing
+import os
+import traceback
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import checkpoint
+import config
+import organism
+from arrayworld import (ArrayWorld, CellIndex, COLUMNS, SPECIES, PLANT, CARNIVORE, NO_PREY, PREY_SPECIES,
+        FEEDING_ORDER, speciesConstants)
+
+
+# A Tile's per-organism state:  ArrayWorld's, plus an id that is unique across
+# all of the Tiles.  prey holds the id of the prey rather than its index, which
+# only means something on one Tile.
+TILE_COLUMNS = tuple((name, np.int64 if name == 'prey' else dtype) for name, dtype in COLUMNS) + (('id', np.int64),)
+
+# The records the Tiles publish to each other during a tick.  Each Tile has one
+# board of each kind, and a board is never written in a phase in which it's read.
+#
+# An organism as its neighbors see it
+ORGANISM = np.dtype([('id', np.int64), ('x', np.int32), ('y', np.int32), ('species', np.int8),
+        ('isAlive', np.bool_)])
+# A child, or a spot proposed for one
+SPOT = np.dtype([('x', np.int64), ('y', np.int64), ('species', np.int8)])
+# An Animal (row animal of hungry on Tile animalTile) proposing to eat row prey
+# of the organisms board of Tile tile
+MEAL = np.dtype([('tile', np.int32), ('prey', np.int64), ('distanceSquared', np.int64),
+        ('animalTile', np.int32), ('animalId', np.int64), ('animal', np.int64)])
+# A meal that was granted to row animal of hungry on Tile tile
+WIN = np.dtype([('tile', np.int32), ('animal', np.int64)])
+# An organism moving to Tile tile, with all of its state
+MIGRANT = np.dtype(list(TILE_COLUMNS) + [('tile', np.int32)])
+
+BOARDS = {'organisms': ORGANISM,
+        'children': SPOT,
+        'candidates': SPOT,
+        'meals': MEAL,
+        'wins': WIN,
+        'migrants': MIGRANT}
+
+# Bytes before the records of a board:  the number of records
+HEADER_SIZE = 8
+# Smallest shared memory block a board is given
+MIN_BOARD_SIZE = 4096
+
+# Returns the width of each of the strips a world of the given width is split
+# into.  The last strip may extend past the edge of the world.
+def stripWidth(worldWidth, tiles):
+    return int(math.ceil((worldWidth + 1) / tiles))
+
+# Returns how far past the edges of its strip a Tile needs to see its neighbors'
+# organisms:  far enough for its Animals to see and eat across the border (and
+# keep track of prey that moved since they saw it), and for its children to be
+# checked for room.
+def haloWidth(settings):
+    size = speciesConstants(settings, 'SIZE')
+    return int(max(speciesConstants(settings, 'SIGHT_RADIUS').max() + 2 * speciesConstants(settings, 'SPEED').max(),
+            speciesConstants(settings, 'MAX_EAT_RADIUS').max(),
+            speciesConstants(settings, 'REPRODUCTION_RADIUS').max() + 2 * size.max()))
+
+# Returns the most Tiles a world with the given settings can be split into:  no
+# strip may be narrower than the halo, so that organisms only ever interact with
+# and move to the neighboring strips.
+def maxTiles(settings):
+    return max(1, (settings.WORLD_SIZE[0] + 1) // haloWidth(settings))
+
+# Returns SPOT records for organisms of the given species at (x, y)
+def spots(species, x, y):
+    records = np.empty(len(x), SPOT)
+    records['x'] = x
+    records['y'] = y
+    records['species'] = species
+    return records
+
+
+# A block of shared memory that one process writes records to and the others
+# read:  the number of records followed by the records.  The block is replaced
+# by a bigger one (with a new name) when the records outgrow it.
+class Board:
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.memory = None
+        self.count = 0
+
+    # Returns the name readers attach to, or None before the first write
+    def name(self):
+        return None if self.memory is None else self.memory.name
+
+    # Replace the board's contents with records, an array of self.dtype
+    def write(self, records):
+        size = HEADER_SIZE + records.nbytes
+        if self.memory is None or self.memory.size < size:
+            oldSize = 0 if self.memory is None else self.memory.size
+            self.release()
+            self.memory = shared_memory.SharedMemory(create=True, size=max(size, 2 * oldSize, MIN_BOARD_SIZE))
+        self.count = len(records)
+        np.frombuffer(self.memory.buf, np.int64, 1)[0] = self.count
+        np.frombuffer(self.memory.buf, self.dtype, self.count, HEADER_SIZE)[:] = records
+
+    # Set field to value in the given records, without rewriting the others
+    def update(self, indices, field, value):
+        np.frombuffer(self.memory.buf, self.dtype, self.count, HEADER_SIZE)[field][indices] = value
+
+    def release(self):
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+# Reads the boards of other processes, staying attached to each until it's
+# replaced
+class BoardReader:
+    def __init__(self):
+        # Maps a key naming a board to the SharedMemory attached to it
+        self.attached = {}
+
+    # Returns a copy of the records on the board called name, whose records are
+    # of dtype.  key identifies the board across the names it has over time.
+    def read(self, key, name, dtype):
+        if name is None:
+            return np.zeros(0, dtype)
+        memory = self.attached.get(key)
+        if memory is None or memory.name != name:
+            if memory is not None:
+                memory.close()
+            memory = self.attached[key] = shared_memory.SharedMemory(name)
+        count = int(np.frombuffer(memory.buf, np.int64, 1)[0])
+        return np.frombuffer(memory.buf, dtype, count, HEADER_SIZE).copy()
+
+    def close(self):
+        for memory in self.attached.values():
+            memory.close()
+        self.attached.clear()
+
+
+# The part of a TiledWorld in one strip of the world, stepped in its own process.
+# A Tile is a batched ArrayWorld holding the organisms in its strip, which it
+# publishes to its neighbors on shared memory boards.  At the start of each
+# phase that needs them it copies its neighbors' organisms within haloWidth of
+# its strip into the rows after its own (ghosts), so that its Animals can see
+# and eat across the border and its children are checked against everything
+# near them.  Whatever has to be decided by more than one Tile is settled the
+# way a batched ArrayWorld settles it, by the Tile that owns what's contended:
+#
+#   * A spot for a child is checked against the organisms and ghosts, the
+#     children placed so far on this Tile and its neighbors and the spots
+#     proposed before it, in order of Tile and then parent.
+#   * A prey goes to the closest Animal proposing to eat it, on any Tile, ties
+#     to the lowest id.  The prey's Tile decides and tells the eaters' Tiles.
+#
+# Organisms that end a tick outside the strip move to the Tile that owns their
+# new location.
+class Tile(ArrayWorld):
+    columns = TILE_COLUMNS
+
+    def __init__(self, index, tiles, seed, settings):
+        ArrayWorld.__init__(self, seed, settings=settings, batched=True)
+        self.index = index
+        self.tiles = tiles
+        self.stripWidth = stripWidth(self.worldSize[0], tiles)
+        self.left = index * self.stripWidth
+        self.right = self.left + self.stripWidth
+        self.halo = haloWidth(settings)
+        self.neighbors = [tile for tile in (index - 1, index + 1) if 0 <= tile < tiles]
+        # Ids are index + tiles * serial, so no two Tiles ever give out the same one
+        self.nextSerial = 0
+
+        self.boards = {name: Board(dtype) for name, dtype in BOARDS.items()}
+        self.reader = BoardReader()
+        # For each Tile, a dict mapping the name of each of its boards to the name
+        # of its shared memory, as of the start of the current phase
+        self.boardNames = None
+        # Number of ghosts, in rows [count, count + ghosts), and for every row up
+        # to there the Tile that owns it and its row on that Tile
+        self.ghosts = 0
+        self.owners = np.zeros(0, np.int32)
+        self.ownerRows = np.zeros(0, np.int64)
+
+    # Returns the names of this Tile's boards, for the other Tiles to read them by
+    def getBoardNames(self):
+        return {name: board.name() for name, board in self.boards.items()}
+
+    # Returns the records on the given board of the given Tile
+    def read(self, tile, board):
+        return self.reader.read((tile, board), self.boardNames[tile].get(board), BOARDS[board])
+
+    # Returns the records on the given board of each of the given Tiles, together
+    def readAll(self, tiles, board):
+        return np.concatenate([np.zeros(0, BOARDS[board])] + [self.read(tile, board) for tile in tiles])
+
+    def releaseBoards(self):
+        self.reader.close()
+        for board in self.boards.values():
+            board.release()
+
+    def addOrganisms(self, species, x, y):
+        start = self.count
+        ArrayWorld.addOrganisms(self, species, x, y)
+        number = self.count - start
+        self.id[start:self.count] = self.index + self.tiles * np.arange(self.nextSerial, self.nextSerial + number)
+        self.nextSerial += number
+
+    # Add spawned organisms, and return the Tile's statistics
+    def addSpawned(self, species, x, y):
+        self.addOrganisms(species, x, y)
+        return self.getStatistics()
+
+    # Returns the x, y and species arrays of the Tile's organisms
+    def listOrganisms(self):
+        count = self.count
+        return self.x[:count].copy(), self.y[:count].copy(), self.species[:count].copy()
+
+    # Returns the populations, births, deaths and total hunger of each species on
+    # the Tile, as lists that a TiledWorld can add up
+    def getStatistics(self):
+        count = self.count
+        species = self.species[:count]
+        animals = species != PLANT
+        hunger = np.bincount(species[animals], minlength=len(SPECIES),
+                weights=self.timeSinceLastEaten[:count][animals] / self.timeToStarvation[species[animals]])
+        return {'populations': self.populations.tolist(),
+                'births': self.births.tolist(),
+                'deaths': {cause: deaths.tolist() for cause, deaths in self.deaths.items()},
+                'hunger': hunger.tolist()}
+
+    # Publish the Tile's organisms for its neighbors to load as ghosts
+    def publishOrganisms(self):
+        count = self.count
+        records = np.empty(count, ORGANISM)
+        for name in ORGANISM.names:
+            records[name] = getattr(self, name)[:count]
+        self.boards['organisms'].write(records)
+
+    # Copy the organisms near the strip from the neighbors' organisms boards into
+    # the rows after the Tile's own
+    def loadGhosts(self):
+        count = self.count
+        loaded = []
+        for tile in self.neighbors:
+            records = self.read(tile, 'organisms')
+            near = np.flatnonzero((records['x'] >= self.left - self.halo) & (records['x'] < self.right + self.halo))
+            loaded.append((tile, near, records[near]))
+        self.ghosts = sum(len(near) for tile, near, records in loaded)
+        rows = count + self.ghosts
+        self.reserve(rows)
+        self.owners = np.full(rows, self.index, np.int32)
+        self.ownerRows = np.arange(rows)
+        start = count
+        for tile, near, records in loaded:
+            end = start + len(near)
+            for name in ORGANISM.names:
+                getattr(self, name)[start:end] = records[name]
+            self.owners[start:end] = tile
+            self.ownerRows[start:end] = near
+            start = end
+
+    # Returns the rows (own or ghost) of the organisms with the given ids, or
+    # NO_PREY for the ones that aren't there
+    def rowsOf(self, ids):
+        rows = self.count + self.ghosts
+        if rows == 0:
+            return np.full(len(ids), NO_PREY, np.int64)
+        order = np.argsort(self.id[:rows])
+        positions = np.minimum(np.searchsorted(self.id[:rows], ids, sorter=order), rows - 1)
+        return np.where(self.id[order[positions]] == ids, order[positions], NO_PREY)
+
+    # Phase 1:  age everything, publish the organisms as they start the tick and
+    # pick the parents that will try to reproduce
+    def startTurn(self):
+        self.age[:self.count] += 1
+        self.publishOrganisms()
+        self.parents = self.chooseParents()
+        # Species, x and y of the children placed so far this tick
+        self.children = ([], [], [])
+
+    # Phase 2, once per attempt to reproduce:  publish the children placed by
+    # earlier attempts and propose a spot for the child of each parent still
+    # trying.  Returns the number of parents proposing.
+    def proposeChildren(self, attempt):
+        self.boards['children'].write(spots(*self.children))
+        if attempt == 0:
+            self.loadGhosts()
+        self.parents = self.parents[self.maxAttemptsToReproduce[self.species[self.parents]] > attempt]
+        candidatesX, candidatesY = self.childLocations(self.parents)
+        rows = self.count + self.ghosts
+        cellIndex = CellIndex(self.x[:rows], self.y[:rows], self.cellSize, self.worldSize)
+        self.blocked = self.overlaps(cellIndex, self.x[:rows], self.y[:rows], self.size[self.species[:rows]],
+                candidatesX, candidatesY, self.size[self.species[self.parents]])
+        self.candidates = spots(self.species[self.parents], candidatesX, candidatesY)
+        self.boards['candidates'].write(self.candidates)
+        return len(self.parents)
+
+    # Phase 3, once per attempt to reproduce:  place the children whose spots
+    # aren't taken
+    def settleChildren(self):
+        candidates = self.candidates
+        size = self.size[candidates['species']]
+        blocked = self.blocked
+        children = np.concatenate([spots(*self.children), self.readAll(self.neighbors, 'children')])
+        if len(children) > 0:
+            childIndex = CellIndex(children['x'], children['y'], self.cellSize, self.worldSize)
+            blocked |= self.overlaps(childIndex, children['x'], children['y'], self.size[children['species']],
+                    candidates['x'], candidates['y'], size)
+        # Only the Tile to the left proposed spots before this one's
+        earlier = np.zeros(0, SPOT)
+        if self.index > 0:
+            earlier = self.read(self.index - 1, 'candidates')
+            earlier = earlier[earlier['x'] >= self.left - self.halo]
+        proposed = np.concatenate([earlier, candidates])
+        proposedSize = self.size[proposed['species']]
+        proposedIndex = CellIndex(proposed['x'], proposed['y'], self.cellSize, self.worldSize)
+        blocked |= self.overlaps(proposedIndex, proposed['x'], proposed['y'], proposedSize,
+                proposed['x'], proposed['y'], proposedSize, earlierOnly=True)[len(earlier):]
+        placed = candidates[~blocked]
+        for column, values in zip(self.children, (placed['species'], placed['x'], placed['y'])):
+            column.extend(values.tolist())
+        self.parents = self.parents[blocked]
+
+    # Phase 4:  point Carnivores at where their prey is, add the children and
+    # move every Animal, then publish the organisms where they are now
+    def move(self):
+        count = self.count
+        # Prey that died or left sight since it was picked is forgotten, as
+        # ArrayWorld's purge does
+        chasing = np.flatnonzero(self.prey[:count] != NO_PREY)
+        preyRows = self.rowsOf(self.prey[chasing])
+        self.prey[chasing[preyRows == NO_PREY]] = NO_PREY
+        found = preyRows != NO_PREY
+        chasers = chasing[found]
+        preyRows = preyRows[found]
+        carnivores = self.species[chasers] == CARNIVORE
+        self.destinationX[chasers[carnivores]] = self.x[preyRows[carnivores]]
+        self.destinationY[chasers[carnivores]] = self.y[preyRows[carnivores]]
+
+        childSpecies, childrenX, childrenY = self.children
+        self.ghosts = 0
+        if childSpecies:
+            self.addOrganisms(childSpecies, childrenX, childrenY)
+            self.births += np.bincount(childSpecies, minlength=len(SPECIES))
+        self.animals = np.flatnonzero(self.species[:self.count] != PLANT)
+        self.stepAnimals(self.animals)
+        self.publishOrganisms()
+
+    # Phase 5:  every hungry Animal proposes the prey it would eat and, if it's
+    # looking, the prey it would chase.  The Carnivores' meals are published.
+    def proposeMeals(self):
+        self.loadGhosts()
+        animals = self.animals
+        hungry = animals[self.timeSinceLastEaten[animals] >= self.timeToHunger[self.species[animals]]]
+        rows = self.count + self.ghosts
+        cellIndex = CellIndex(self.x[:rows], self.y[:rows], self.cellSize, self.worldSize)
+        tolerance = self.config.Animal.REACHED_LOCATION_TOLERANCE
+        self.searchingMask = ((self.prey[hungry] == NO_PREY)
+                | ((np.abs(self.x[hungry] - self.destinationX[hungry]) < tolerance)
+                    & (np.abs(self.y[hungry] - self.destinationY[hungry]) < tolerance)))
+        self.hungry = hungry
+        self.meals, self.mealDistances = self.proposePrey(cellIndex, hungry, self.maxEatRadius)
+        self.targets, targetDistances = self.proposePrey(cellIndex, hungry[self.searchingMask], self.sightRadius)
+        self.ate = np.zeros(len(hungry), np.bool_)
+        self.publishMeals(FEEDING_ORDER[0])
+
+    # Publish the meals proposed by the hungry Animals of the given species that
+    # are still alive
+    def publishMeals(self, species):
+        hungry = self.hungry
+        proposing = np.flatnonzero((self.species[hungry] == species) & (self.meals != NO_PREY)
+                & self.isAlive[hungry])
+        meals = self.meals[proposing]
+        records = np.empty(len(proposing), MEAL)
+        records['tile'] = self.owners[meals]
+        records['prey'] = self.ownerRows[meals]
+        records['distanceSquared'] = self.mealDistances[proposing]
+        records['animalTile'] = self.index
+        records['animalId'] = self.id[hungry[proposing]]
+        records['animal'] = proposing
+        self.boards['meals'].write(records)
+
+    # Phase 6, once per species in FEEDING_ORDER:  settle the meals proposed for
+    # this Tile's organisms by Animals of the given species
+    def settleMeals(self, species):
+        meals = self.readAll([self.index] + self.neighbors, 'meals')
+        meals = meals[meals['tile'] == self.index]
+        meals = meals[np.lexsort((meals['animalId'], meals['distanceSquared'], meals['prey']))]
+        eaten, firstProposal = np.unique(meals['prey'], return_index=True)
+        self.isAlive[eaten] = False
+        self.boards['organisms'].update(eaten, 'isAlive', False)
+        self.deaths[organism.PREDATION][PREY_SPECIES[species]] += len(eaten)
+        winners = meals[firstProposal]
+        wins = np.empty(len(winners), WIN)
+        wins['tile'] = winners['animalTile']
+        wins['animal'] = winners['animal']
+        self.boards['wins'].write(wins)
+
+    # Phase 7, once per species in FEEDING_ORDER:  feed the Animals whose meals
+    # were granted.  Then the next species' meals are published or, after the
+    # last, the Animals that didn't eat chase what they saw.
+    def collectMeals(self, species):
+        wins = self.readAll([self.index] + self.neighbors, 'wins')
+        self.ate[wins['animal'][wins['tile'] == self.index]] = True
+        position = FEEDING_ORDER.index(species)
+        if position + 1 < len(FEEDING_ORDER):
+            self.publishMeals(FEEDING_ORDER[position + 1])
+        else:
+            self.chase()
+
+    # Finish feeding:  Animals that ate move on and the rest chase what they saw,
+    # unless it was just eaten
+    def chase(self):
+        # Catch the ghosts up on which of them were eaten
+        count = self.count
+        for tile in self.neighbors:
+            isAlive = self.read(tile, 'organisms')['isAlive']
+            ghosts = np.flatnonzero(self.owners[count:] == tile) + count
+            self.isAlive[ghosts] = isAlive[self.ownerRows[ghosts]]
+
+        hungry = self.hungry
+        prey = self.prey
+        eaters = hungry[self.ate]
+        self.timeSinceLastEaten[eaters] = 0
+        # Herbivores only need something else to do if they were chasing their
+        # meal; Carnivores always move on.
+        movingOn = eaters[(self.species[eaters] == CARNIVORE) | (prey[eaters] != NO_PREY)]
+        prey[movingOn] = NO_PREY
+        self.needsNewDestination = np.zeros(count, np.bool_)
+        self.needsNewDestination[movingOn] = True
+
+        searching = hungry[self.searchingMask]
+        chasing = ~self.ate[self.searchingMask] & self.isAlive[searching]
+        chasers = searching[chasing]
+        targets = self.targets[chasing]
+        found = targets != NO_PREY
+        found[found] = self.isAlive[targets[found]]
+        prey[chasers] = NO_PREY
+        prey[chasers[found]] = self.id[targets[found]]
+        self.destinationX[chasers[found]] = self.x[targets[found]]
+        self.destinationY[chasers[found]] = self.y[targets[found]]
+
+    # Phase 8:  starve Animals, pick new destinations and remove the dead
+    # organisms and the ones that have left the strip, which are published as
+    # migrants
+    def finishTurn(self):
+        count = self.count
+        animals = self.animals
+        self.starveAnimals(animals)
+        tolerance = self.config.Animal.REACHED_LOCATION_TOLERANCE
+        arrived = ((np.abs(self.x[animals] - self.destinationX[animals]) < tolerance)
+                & (np.abs(self.y[animals] - self.destinationY[animals]) < tolerance))
+        self.needsNewDestination[animals[arrived]] = True
+        self.pickNewDestinations(np.flatnonzero(self.needsNewDestination & self.isAlive[:count]))
+
+        isAlive = self.isAlive[:count].copy()
+        x = self.x[:count]
+        leaving = isAlive & ((x < self.left) | (x >= self.right))
+        migrants = np.empty(int(np.count_nonzero(leaving)), MIGRANT)
+        for name, dtype in self.columns:
+            migrants[name] = getattr(self, name)[:count][leaving]
+        migrants['tile'] = migrants['x'] // self.stripWidth
+        self.boards['migrants'].write(migrants)
+
+        self.populations -= np.bincount(self.species[:count][~isAlive | leaving], minlength=len(SPECIES))
+        staying = isAlive & ~leaving
+        survivors = int(np.count_nonzero(staying))
+        for name, dtype in self.columns:
+            column = getattr(self, name)
+            column[:survivors] = column[:count][staying]
+        self.count = survivors
+        self.ghosts = 0
+
+    # Phase 9:  take in the organisms that moved into the strip.  Returns the
+    # Tile's statistics.
+    def receiveMigrants(self):
+        arrivals = self.readAll([tile for tile in range(self.tiles) if tile != self.index], 'migrants')
+        arrivals = arrivals[arrivals['tile'] == self.index]
+        start = self.count
+        self.reserve(start + len(arrivals))
+        for name, dtype in self.columns:
+            getattr(self, name)[start:start + len(arrivals)] = arrivals[name]
+        self.count = start + len(arrivals)
+        self.populations += np.bincount(arrivals['species'], minlength=len(SPECIES))
+        return self.getStatistics()
+
+
+# The worker process for one Tile.  It runs the Tile's methods as commands of
+# the form (method name, every Tile's board names, arguments) arrive and replies
+# (True, its board names, result), or (False, None, traceback) if one fails.
+def runTile(connection, index, tiles, seed, settingsValues):
+    tile = Tile(index, tiles, seed, checkpoint.settingsFromDict(settingsValues))
+    try:
+        while True:
+            command, boardNames, arguments = connection.recv()
+            if command == 'quit':
+                break
+            tile.boardNames = boardNames
+            try:
+                result = getattr(tile, command)(*arguments)
+            except Exception:
+                connection.send((False, None, traceback.format_exc()))
+            else:
+                connection.send((True, tile.getBoardNames(), result))
+    except (EOFError, KeyboardInterrupt):
+        pass # The TiledWorld has gone away
+    finally:
+        tile.releaseBoards()
+        connection.close()
+
+
+# An alternative to ArrayWorld for worlds too big for one core.  The world is
+# split into vertical strips, each simulated by a Tile in its own process, and
+# the Tiles step through each tick in lockstep, exchanging the organisms near
+# their borders (and their claims on them) over shared memory.  The rules are a
+# batched ArrayWorld's; see Tile for how they work across strips.  With one
+# Tile it follows the same trajectory as a batched ArrayWorld holding the same
+# organisms, and with more the trajectory depends on the number of Tiles, since
+# each has its own random number generator.
+#
+# Strips are never narrower than haloWidth, which limits the number of Tiles
+# for small worlds.  A TiledWorld must be closed (or used in a with statement)
+# to stop its processes and free their shared memory.
+class TiledWorld:
+    # tiles defaults to the number of CPUs.  settings is the config module or a
+    # copy of it made by config.copy().
+    def __init__(self, seed=None, tiles=None, settings=config):
+        self.config = settings
+        self.worldSize = settings.WORLD_SIZE
+        self.tiles = max(1, min(tiles or os.cpu_count() or 1, maxTiles(settings)))
+        self.stripWidth = stripWidth(self.worldSize[0], self.tiles)
+        self.maxAttemptsToReproduce = int(speciesConstants(settings, 'MAX_ATTEMPTS_TO_REPRODUCE').max())
+        # One seed per Tile, plus one for spawning
+        seeds = np.random.SeedSequence(seed).spawn(self.tiles + 1)
+        self.rng = np.random.default_rng(seeds[-1])
+
+        # Started here so that every Tile shares it, and shared memory that one
+        # Tile creates and another attaches to is only cleaned up once
+        resource_tracker.ensure_running()
+        settingsValues = checkpoint.settingsToDict(settings)
+        self.boardNames = [{} for tile in range(self.tiles)]
+        self.connections = []
+        self.processes = []
+        for index in range(self.tiles):
+            connection, workerConnection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=runTile,
+                    args=(workerConnection, index, self.tiles, seeds[index], settingsValues), daemon=True)
+            process.start()
+            workerConnection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.statistics = self.broadcast('getStatistics')
+
+    # Run a command on every Tile with the given arguments and return their results
+    def broadcast(self, command, *arguments):
+        return self.scatter(command, [arguments] * self.tiles)
+
+    # Run a command on every Tile with its own arguments from argumentsByTile and
+    # return their results
+    def scatter(self, command, argumentsByTile):
+        for connection, arguments in zip(self.connections, argumentsByTile):
+            connection.send((command, self.boardNames, arguments))
+        results = []
+        failures = []
+        for index, connection in enumerate(self.connections):
+            try:
+                succeeded, boardNames, result = connection.recv()
+            except EOFError:
+                raise RuntimeError("Tile %d exited unexpectedly" % index)
+            if succeeded:
+                self.boardNames[index] = boardNames
+                results.append(result)
+            else:
+                failures.append("Tile %d failed:\n%s" % (index, result))
+        if failures:
+            raise RuntimeError("\n".join(failures))
+        return results
+
+    # Stop the Tiles' processes, which frees their shared memory
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(('quit', None, ()))
+            except (BrokenPipeError, OSError):
+                pass # It has already exited
+        for process in self.processes:
+            process.join(5.0)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+    # Returns the sum over the Tiles of the given statistic for the species of
+    # the given type.  cause picks one of the deaths statistics.
+    def totalStatistic(self, name, organismType, cause=None):
+        codes = [species for species, speciesType in enumerate(SPECIES) if issubclass(speciesType, organismType)]
+        return sum(sum((statistics[name] if cause is None else statistics[name][cause])[species]
+                for species in codes) for statistics in self.statistics)
+
+    # Returns the number of living organisms of the given type in the world
+    def countOrganisms(self, organismType):
+        return int(self.totalStatistic('populations', organismType))
+
+    # Returns the number of organisms of the given type born since the world was
+    # created
+    def countBirths(self, organismType):
+        return int(self.totalStatistic('births', organismType))
+
+    # Returns the number of organisms of the given type that have died of cause
+    # since the world was created
+    def countDeaths(self, organismType, cause):
+        return int(self.totalStatistic('deaths', organismType, cause))
+
+    # Returns how close the living Animals of the given type are to starving on
+    # average, from 0 (all just ate) to 1 (all about to starve), or None if there
+    # aren't any
+    def meanHunger(self, organismType):
+        population = self.totalStatistic('populations', organismType)
+        if population == 0:
+            return None
+        return self.totalStatistic('hunger', organismType) / population
+
+    # Spawn up to numberToSpawn organisms of organismType at random free
+    # locations, as ArrayWorld.spawnOrganisms does, and hand each to the Tile
+    # whose strip it's in.  Returns the number actually spawned.
+    def spawnOrganisms(self, organismType, numberToSpawn, createWithSpawnRing):
+        layout = ArrayWorld(capacity=0, settings=self.config)
+        layout.rng = self.rng
+        for x, y, species in self.broadcast('listOrganisms'):
+            start = layout.count
+            layout.reserve(start + len(x))
+            layout.x[start:start + len(x)] = x
+            layout.y[start:start + len(x)] = y
+            layout.species[start:start + len(x)] = species
+            layout.count = start + len(x)
+        start = layout.count
+        spawned = layout.spawnOrganisms(organismType, numberToSpawn, createWithSpawnRing)
+        x = layout.x[start:layout.count]
+        y = layout.y[start:layout.count]
+        tiles = x // self.stripWidth
+        species = layout.speciesOf(organismType)
+        self.statistics = self.scatter('addSpawned',
+                [(species, x[tiles == tile], y[tiles == tile]) for tile in range(self.tiles)])
+        return spawned
+
+    # Age everything and let every organism that should reproduce this turn try
+    # to place a child
+    def reproduce(self):
+        self.broadcast('startTurn')
+        for attempt in range(max(1, self.maxAttemptsToReproduce)):
+            # The first attempt always runs, since it's when the Tiles load ghosts
+            if sum(self.broadcast('proposeChildren', attempt)) == 0:
+                break
+            self.broadcast('settleChildren')
+
+    # Take one step for every Animal in the direction of its destination
+    def moveAnimals(self):
+        self.broadcast('move')
+
+    # Let every hungry Animal eat prey within reach or, failing that, pick prey
+    # within sight to chase
+    def feedAnimals(self):
+        self.broadcast('proposeMeals')
+        for species in FEEDING_ORDER:
+            self.broadcast('settleMeals', species)
+            self.broadcast('collectMeals', species)
+
+    # Starve Animals, remove the dead and move organisms between Tiles
+    def purgeDeadOrganisms(self):
+        self.broadcast('finishTurn')
+        self.statistics = self.broadcast('receiveMigrants')
+
+    # Pass one unit of time for every organism in the world
+    def doTurn(self):
+        self.reproduce()
+        self.moveAnimals()
+        self.feedAnimals()
+        self.purgeDeadOrganisms()
@@ -0,0 +1,80 @@
+import collections
+import json
+
+
+# Categories of events, which can be traced independently
+SPAWN = 'spawn'
+REPRODUCE = 'reproduce'
+EAT = 'eat'
+STARVE = 'starve'
+MOVE = 'move'
+CATEGORIES = (SPAWN, REPRODUCE, EAT, STARVE, MOVE)
+
+# The fields recorded with each category of event, after the category and tick.
+# Organisms are identified by species name and location.
+FIELDS = {SPAWN: ('species', 'x', 'y'),
+        REPRODUCE: ('species', 'x', 'y', 'childX', 'childY'),
+        EAT: ('species', 'x', 'y', 'prey', 'preyX', 'preyY'),
+        STARVE: ('species', 'x', 'y'),
+        MOVE: ('species', 'x', 'y')}
+
+# How many events are held in memory at a time
+CAPACITY = 65536
+
+
+# Collects structured events from a World.  Each category in CATEGORIES is a
+# boolean attribute saying whether it's being traced, so a hook costs one
+# attribute check when its category is off:
+#
+#     if self.world.tracer.eat:
+#         self.world.tracer.record(tracing.EAT, ...)
+#
+# Events are (category, tick, fields...) tuples kept in a ring buffer.  With a
+# sink they're handed to sink.write() CAPACITY at a time (and when the Tracer is
+# flushed); without one the buffer just keeps the most recent CAPACITY events for
+# inspection.
+class Tracer:
+    # categories are the categories of event to record.  tick is the tick the
+    # World is on, for a World resumed from a checkpoint.
+    def __init__(self, categories=(), sink=None, capacity=CAPACITY, tick=0):
+        for category in categories:
+            if category not in CATEGORIES:
+                raise ValueError("Unknown event category " + repr(category))
+        for category in CATEGORIES:
+            setattr(self, category, category in categories)
+        self.sink = sink
+        self.capacity = capacity
+        self.tick = tick # Advanced by the World at the start of every turn
+        self.events = collections.deque(maxlen=capacity)
+
+    def record(self, category, *fields):
+        events = self.events
+        events.append((category, self.tick) + fields)
+        if len(events) == self.capacity and self.sink is not None:
+            self.flush()
+
+    # Hand the buffered events to the sink
+    def flush(self):
+        if self.sink is not None and self.events:
+            self.sink.write(self.events)
+            self.events.clear()
+
+    def close(self):
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+
+
+# Writes events to a file with one JSON object per line, such as
+# {"event": "eat", "tick": 12, "species": "Herbivore", "x": 5, ...}
+class JsonLinesSink:
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, events):
+        lines = [json.dumps(dict(zip(('event', 'tick') + FIELDS[event[0]], event))) for event in events]
+        lines.append("")
+        self.file.write("\n".join(lines))
+
+    def close(self):
+        self.file.close()
@@ -9,9 +9,9 @@
 
 import math
 
-LOGGING = False
-
 class Location:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0, y=0):
         self.x = x
         self.y = y
@@ -22,26 +22,31 @@ class Location:
     # Returns the Euclidean distance between this and otherLocation
     def distanceFrom(self, otherLocation):
         return math.sqrt((self.x - otherLocation.x)**2 + (self.y - otherLocation.y)**2)
+
+    # Returns the square of distanceFrom(otherLocation), which is cheaper and is
+    # all a comparison against a radius needs (compare it to the radius squared)
+    def distanceSquaredFrom(self, otherLocation):
+        deltaX = self.x - otherLocation.x
+        deltaY = self.y - otherLocation.y
+        return deltaX * deltaX + deltaY * deltaY
     
     
-# From the array of organisms, returns an array of organisms within the given radius
+# From the array of organisms, yields the organisms within the given radius
 # from the given location.
 def getOrganismsInRadius(organisms, location, radius):
-    organismsInRadius = []
+    radiusSquared = radius * radius
     for organism in organisms:
-        if organism.location.distanceFrom(location) <= radius:
-            organismsInRadius.append(organism)
-    return organismsInRadius
+        if organism.location.distanceSquaredFrom(location) <= radiusSquared:
+            yield organism
     
-# From the array of organisms, returns an array of living organisms within the given radius
+# From the array of organisms, yields the living organisms within the given radius
 # from the given location who have the given type.
 def getLivingOrganismsInRadiusWithType(organisms, location, radius, type):
-    organismsInRadius = []
+    radiusSquared = radius * radius
     for organism in organisms:
         if isinstance(organism, type) and organism.isAlive and \
-                organism.location.distanceFrom(location) <= radius:
-            organismsInRadius.append(organism)
-    return organismsInRadius
+                organism.location.distanceSquaredFrom(location) <= radiusSquared:
+            yield organism
     
 # Returns: min if value <= min, max if value >= max, else value.
 def clip(value, min, max):
@@ -0,0 +1,133 @@
+import multiprocessing
+import world
+from scheduler import Scheduler
+from profiler import Profiler
+from snapshot import Snapshot, packSnapshot
+from telemetry import TelemetryRecorder
+
+
+# Runs a World in its own process so that ticks and frames can overlap on
+# separate cores, and a slow tick doesn't freeze the window (or a slow frame stall
+# the simulation).  The World never leaves the worker:  the window asks for
+# Snapshots of it, and everything the user does to it (spawning Organisms,
+# pausing, fast-forwarding) is sent over as a command and carried out between
+# ticks.
+#
+# Snapshots are double buffered:  the window asks for the next one as soon as it
+# receives one, so the worker packs the next Snapshot while the window is still
+# drawing the last.
+class SimulationProcess:
+    # setup(world) is called in the worker before the first tick, e.g. to spawn
+    # the starting Organisms.  It must be a module-level function.  If
+    # telemetryPath is given, the worker appends statistics about each tick to it.
+    def __init__(self, seed, tickRate, frameRate, setup, telemetryPath=None):
+        self.connection, workerConnection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=runWorker,
+                args=(workerConnection, seed, tickRate, frameRate, setup, telemetryPath), daemon=True)
+        self.process.start()
+        workerConnection.close()
+        self.requestSnapshot()
+
+    # Ask for a Snapshot of the World as of the worker's next frame
+    def requestSnapshot(self):
+        self.connection.send(('snapshot',))
+
+    # Wait for the requested Snapshot and return it
+    def receiveSnapshot(self):
+        return Snapshot(self.connection.recv_bytes())
+
+    def spawnOrganism(self, organismType):
+        self.connection.send(('spawn', organismType))
+
+    def togglePause(self):
+        self.connection.send(('togglePause',))
+
+    def setSpeed(self, speed):
+        self.connection.send(('setSpeed', speed))
+
+    # Start profiling the World's ticks, or stop if they're being profiled.  While
+    # profiling, each Snapshot has the profile so far.
+    def toggleProfiler(self):
+        self.connection.send(('toggleProfiler',))
+
+    # Stop the worker and wait for it to exit
+    def stop(self):
+        try:
+            self.connection.send(('quit',))
+        except (BrokenPipeError, OSError):
+            pass # It has already exited
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+
+# The simulation side of a SimulationProcess
+class SimulationWorker:
+    def __init__(self, connection, seed, tickRate, frameRate, setup, telemetryPath=None):
+        self.connection = connection
+        self.world = world.World(seed=seed)
+        setup(self.world)
+        self.scheduler = Scheduler(tickRate, frameRate)
+        self.isSnapshotRequested = False
+        self.profiler = None
+        self.recorder = None
+        if telemetryPath is not None:
+            self.recorder = TelemetryRecorder(self.world, telemetryPath)
+
+    # Carry out the commands that have arrived since the last frame.  Returns
+    # false once the worker should stop.
+    def handleCommands(self):
+        try:
+            while self.connection.poll():
+                command = self.connection.recv()
+                if command[0] == 'quit':
+                    return False
+                elif command[0] == 'snapshot':
+                    self.isSnapshotRequested = True
+                elif command[0] == 'spawn':
+                    organismType = command[1]
+                    if self.world.spawnOrganisms(organismType, 1, True) == 0:
+                        print("There's no room for another", organismType.__name__)
+                elif command[0] == 'togglePause':
+                    self.scheduler.togglePause()
+                elif command[0] == 'setSpeed':
+                    self.scheduler.setSpeed(command[1])
+                elif command[0] == 'toggleProfiler':
+                    if self.profiler is None:
+                        self.profiler = Profiler()
+                        self.profiler.install()
+                    else:
+                        self.profiler.uninstall()
+                        self.profiler = None
+                else:
+                    raise ValueError("Unknown command " + repr(command))
+        except EOFError:
+            return False # The window has gone away
+        return True
+
+    # Send a Snapshot if the window is waiting for one.  Otherwise the window is
+    # still busy drawing and this frame is skipped.
+    def publishSnapshot(self):
+        if self.isSnapshotRequested:
+            profile = None if self.profiler is None else self.profiler.summary()
+            self.connection.send_bytes(packSnapshot(self.world, self.scheduler, profile))
+            self.isSnapshotRequested = False
+
+    # Run one tick.  World.doTurn is looked up every tick rather than once, so a
+    # Profiler installed part way through the run sees the ticks.
+    def doTurn(self):
+        if self.recorder is None:
+            self.world.doTurn()
+        else:
+            self.recorder.doTurn()
+
+    def run(self):
+        try:
+            self.scheduler.run(self.doTurn, self.handleCommands, self.publishSnapshot)
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+        self.connection.close()
+
+def runWorker(connection, seed, tickRate, frameRate, setup, telemetryPath=None):
+    SimulationWorker(connection, seed, tickRate, frameRate, setup, telemetryPath).run()
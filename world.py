@@ -8,71 +8,349 @@
 #
 
 from util import Location
-from util import LOGGING
+from spatial import SpatialGrid
+from placement import Placer
 import config
+import itertools
 import math
-import organism
+import operator
 import random
-
-organisms = []
+import tracing
+from organism import Animal, Traits
+from reproduction import ReproductionQueue
 
 print("Importing world module")
-    
-# Returns true if there is room at targetLocation for the specified Organism
-def canFit(theOrganism, targetLocation):
-    for existingOrganism in organisms:
-        if (existingOrganism.location.distanceFrom(targetLocation)) \
-                < theOrganism.size + existingOrganism.size:
-            return False
-    return True
-
-# Return a random location (uniformly distributed) in the world
-def randomLocation():
-    return Location(random.randint(0, config.WORLD_SIZE[0]), random.randint(0, config.WORLD_SIZE[1]))
-
-# Returns a random location (uniformly distributed) in a circle with the specified
-# center Location and radius.
-def randomLocationInCircle(center, radius):
-    orientationRad = random.uniform(0, 2.0 *  math.pi)
-    distanceFromCenter = random.uniform(0, radius)
-    randomLocation = Location()
-    randomLocation.x = int(center.x + radius * math.sin(orientationRad))
-    randomLocation.y = int(center.y + radius * math.cos(orientationRad))
-    # Bound the new location within the world
-    randomLocation.x = max(0, min(config.WORLD_SIZE[0], randomLocation.x))
-    randomLocation.y = max(0, min(config.WORLD_SIZE[1], randomLocation.y))
-    return randomLocation
-    
-def spawnOrganisms(organismType, numberToSpawn, createWithSpawnRing):
-    for i in range(numberToSpawn):
-        newOrganism = organismType(createWithSpawnRing)
-        while True:
-            potentialLocation = randomLocation()
-            if LOGGING:
-                print("Attempting to spawn", organismType.__name__, "at", potentialLocation)
-            if canFit(newOrganism, potentialLocation):
-                newOrganism.location = potentialLocation
-                break
-        if LOGGING:
-            print("Spawning new", organismType.__name__, "at", newOrganism.location)
-        organisms.append(newOrganism)
-    if LOGGING:
-        print("Spawned", numberToSpawn, organismType.__name__ + "s")
-        
-# Remove all dead organisms from the organism array
-# @consider doing this differently.  We're doing a full copy of the Herbivore array
-# every clock tick...might be better to either store these as a linked list or do
-# this purge less frequently.
-def purgeDeadOrganisms():
-    global organisms
-    survivingOrganisms = []
-    for theOrganism in organisms:
-        if theOrganism.isAlive:
-            survivingOrganisms.append(theOrganism)
-    organisms = survivingOrganisms
-        
-# Pass one unit of time for every Organism in the world
-def doTurn():
-    for theOrganism in organisms:
-        theOrganism.doTurn()
-    purgeDeadOrganisms()
+
+# Reads an Animal's timeSinceLastEaten, for meanHunger
+getTimeSinceLastEaten = operator.attrgetter('timeSinceLastEaten')
+
+# The state of one simulation:  its Organisms, settings, random number generator
+# and spatial grids.  Any number of Worlds can exist side by side in a process.
+class World:
+    # settings is the config module or a copy of it made by config.copy().  seed
+    # seeds the World's random number generator.  tracer is a tracing.Tracer to
+    # record events to; by default nothing is traced.
+    def __init__(self, settings=config, seed=None, tracer=None):
+        self.config = settings
+        self.tracer = tracing.Tracer() if tracer is None else tracer
+        # All of the simulation's randomness comes from this generator so that a
+        # run can be reproduced from its seed.
+        self.rng = random.Random(seed)
+        self.reset()
+
+    # Remove every Organism from the World.  Settings derived from self.config are
+    # recomputed, so changes made to it before calling this take effect.
+    def reset(self):
+        settings = self.config
+        # The largest SIZE of any kind of Organism.  Two Organisms can only collide
+        # if they're closer than their combined sizes, so cells at least twice
+        # this keep canFit and clearance searches to a few cells.
+        self.maxOrganismSize = max(settings.Plant.SIZE, settings.Herbivore.SIZE, settings.Carnivore.SIZE)
+        # Side length of the spatial grids' cells.  Half the largest sight radius
+        # keeps sight queries to a 5x5 block of cells while keeping the cells small
+        # enough that eating and canFit queries don't have to wade through many
+        # Organisms.
+        self.gridCellSize = max(max(settings.Herbivore.SIGHT_RADIUS, settings.Carnivore.SIGHT_RADIUS) / 2.0,
+                2 * self.maxOrganismSize)
+
+        # Number of turns taken since the last reset
+        self.tick = 0
+        # Every Organism in the World.  Each Organism's index attribute is its
+        # position in this list.
+        self.organisms = []
+        # The Animals in the order they take their turns.  Plants don't take
+        # turns:  all they do is reproduce, which reproductionQueue schedules.
+        self.animals = []
+        self.reproductionQueue = ReproductionQueue()
+        # Organisms that died this turn.  They stay in organisms (so that the list
+        # can be iterated while Organisms die) until purgeDeadOrganisms swaps them
+        # out.
+        self.deadOrganisms = []
+        # Each type of Organism has its own spatial grid and population count so
+        # that searches for one kind of prey never look at the others.  Both are
+        # keyed by Organism class and filled in the first time an Organism of a
+        # class is added.
+        self.grids = {}
+        self.populations = {}
+        # Running totals for telemetry:  births maps Organism class to the number
+        # born (not spawned) since the last reset, and deaths maps (Organism class,
+        # cause of death) to the number that died that way.
+        self.births = {}
+        self.deaths = {}
+        # Maps each type passed to gridsForType to its result
+        self.gridsForTypeCache = {}
+        # Maps Organism class to the Traits shared by Organisms of that class
+        self.traits = {}
+        # Reused by clearanceInBox for the Organisms it gathers
+        self.obstacleBuffer = []
+
+    # Reseed the World's random number generator.  Runs from the same seed and
+    # starting organisms follow the same trajectory.
+    def seed(self, value):
+        self.rng.seed(value)
+
+    # Returns the state of the World's random number generator as plain lists and
+    # numbers that can be serialized (e.g. with json) and passed to setRandomState.
+    def getRandomState(self):
+        version, internalState, gaussNext = self.rng.getstate()
+        return [version, list(internalState), gaussNext]
+
+    def setRandomState(self, state):
+        version, internalState, gaussNext = state
+        self.rng.setstate((version, tuple(internalState), gaussNext))
+
+    # Returns the Traits of Organisms of organismType in this World
+    def getTraits(self, organismType):
+        traits = self.traits.get(organismType)
+        if traits is None:
+            traits = self.traits[organismType] = Traits(self.config, organismType)
+        return traits
+
+    # Returns the spatial grids holding Organisms of organismType or its subclasses
+    def gridsForType(self, organismType):
+        typeGrids = self.gridsForTypeCache.get(organismType)
+        if typeGrids is None:
+            typeGrids = [typeGrid for gridType, typeGrid in self.grids.items() if issubclass(gridType, organismType)]
+            self.gridsForTypeCache[organismType] = typeGrids
+        return typeGrids
+
+    # Returns true if there is room at targetLocation for the specified Organism
+    def canFit(self, theOrganism, targetLocation):
+        size = theOrganism.traits.size
+        x = targetLocation.x
+        y = targetLocation.y
+        for gridType, typeGrid in self.grids.items():
+            if typeGrid.hasOrganismCloserThan(x, y, size + self.getTraits(gridType).size):
+                return False
+        return True
+
+    # Returns how far the closest Organism is from overlapping theOrganism if it
+    # were at targetLocation:  negative if it would overlap (so it can't fit), at
+    # least 0 if it fits.
+    def clearance(self, theOrganism, targetLocation):
+        size = theOrganism.traits.size
+        x = targetLocation.x
+        y = targetLocation.y
+        clearance = float("inf")
+        for gridType, typeGrid in self.grids.items():
+            gridClearance = typeGrid.getClearance(x, y, size + self.getTraits(gridType).size)
+            if gridClearance < clearance:
+                clearance = gridClearance
+        return clearance
+
+    # Returns a function like clearance for theOrganism, taking (x, y), that
+    # only works for locations inside the box from (left, top) to (right,
+    # bottom).  The Organisms near the box are gathered once, so checking many
+    # locations in it doesn't search the grids for each one.  They're kept in a
+    # buffer that the next call reuses, so only the most recently returned
+    # function can be used.
+    def clearanceInBox(self, theOrganism, left, top, right, bottom):
+        size = theOrganism.traits.size
+        obstacles = self.obstacleBuffer
+        obstacles.clear()
+        for gridType, typeGrid in self.grids.items():
+            reach = size + self.getTraits(gridType).size
+            for existingOrganism in typeGrid.getOrganismsInBox(left - reach, top - reach, right + reach, bottom + reach):
+                existingLocation = existingOrganism.location
+                obstacles.append((existingLocation.x, existingLocation.y, reach))
+        hypot = math.hypot
+        def clearanceAt(x, y):
+            clearance = float("inf")
+            for existingX, existingY, reach in obstacles:
+                existingClearance = hypot(existingX - x, existingY - y) - reach
+                if existingClearance < clearance:
+                    clearance = existingClearance
+            return clearance
+        return clearanceAt
+
+    # Yields the living organisms of the given type within radius of location.
+    # Dead Organisms are taken out of the grid as soon as they die, so there's no
+    # need to check whether each one is alive.
+    def getLivingOrganismsInRadiusWithType(self, location, radius, type):
+        x = location.x
+        y = location.y
+        for typeGrid in self.gridsForType(type):
+            yield from typeGrid.getOrganismsWithin(x, y, radius)
+
+    # Returns the living Organism of the given type nearest to location within
+    # radius of it, or None if there isn't one.  Ties go to the first one found.
+    def getNearestLivingOrganismWithType(self, location, radius, type):
+        x = location.x
+        y = location.y
+        nearest = None
+        for typeGrid in self.gridsForType(type):
+            candidate = typeGrid.getNearest(x, y, radius)
+            if candidate is not None:
+                if nearest is None or candidate.location.distanceSquaredFrom(location) < nearest.location.distanceSquaredFrom(location):
+                    nearest = candidate
+        return nearest
+
+    # Add a new Organism to the World.  Its location must already be set.  isBirth
+    # is true if it was born to an Organism already in the World rather than
+    # spawned.
+    def addOrganism(self, newOrganism, isBirth=False):
+        assert newOrganism.world is self
+        organismType = type(newOrganism)
+        typeGrid = self.grids.get(organismType)
+        if typeGrid is None:
+            typeGrid = self.grids[organismType] = SpatialGrid(self.gridCellSize)
+            self.populations[organismType] = 0
+            self.gridsForTypeCache.clear()
+        newOrganism.index = len(self.organisms)
+        self.organisms.append(newOrganism)
+        if isinstance(newOrganism, Animal):
+            self.animals.append(newOrganism)
+        newOrganism.scheduleReproduction()
+        typeGrid.insert(newOrganism)
+        self.populations[organismType] += 1
+        if isBirth:
+            self.births[organismType] = self.births.get(organismType, 0) + 1
+
+    # End theOrganism's life.  It disappears from spatial queries right away and
+    # is removed from organisms by the next purgeDeadOrganisms.  cause is
+    # organism.STARVATION or organism.PREDATION.
+    def killOrganism(self, theOrganism, cause):
+        assert theOrganism.isAlive
+        organismType = type(theOrganism)
+        theOrganism.isAlive = False
+        self.grids[organismType].remove(theOrganism)
+        self.populations[organismType] -= 1
+        key = (organismType, cause)
+        self.deaths[key] = self.deaths.get(key, 0) + 1
+        self.deadOrganisms.append(theOrganism)
+        self.reproductionQueue.cancel()
+
+    # Let the World know that theOrganism's location has changed
+    def organismMoved(self, theOrganism):
+        self.grids[type(theOrganism)].move(theOrganism)
+
+    # Returns how many steps of (stepX, stepY) theOrganism can take before it
+    # might have to tell the World it moved:  until then it stays in the same
+    # grid cell, and organismMoved wouldn't change anything.
+    def stepsInGridCell(self, theOrganism, stepX, stepY):
+        return self.grids[type(theOrganism)].stepsInCell(theOrganism.location, stepX, stepY)
+
+    # Return a random location (uniformly distributed) in the World.  If location
+    # is given it's moved there and returned instead of making a new Location.
+    def randomLocation(self, location=None):
+        worldSize = self.config.WORLD_SIZE
+        if location is None:
+            return Location(self.rng.randint(0, worldSize[0]), self.rng.randint(0, worldSize[1]))
+        location.x = self.rng.randint(0, worldSize[0])
+        location.y = self.rng.randint(0, worldSize[1])
+        return location
+
+    # Returns a random location (uniformly distributed) in a circle with the
+    # specified center Location and radius.
+    def randomLocationInCircle(self, center, radius):
+        orientationRad = self.rng.uniform(0, 2.0 *  math.pi)
+        distanceFromCenter = self.rng.uniform(0, radius)
+        randomLocation = Location()
+        randomLocation.x = int(center.x + radius * math.sin(orientationRad))
+        randomLocation.y = int(center.y + radius * math.cos(orientationRad))
+        # Bound the new location within the World
+        worldSize = self.config.WORLD_SIZE
+        randomLocation.x = max(0, min(worldSize[0], randomLocation.x))
+        randomLocation.y = max(0, min(worldSize[1], randomLocation.y))
+        return randomLocation
+
+    # Returns a Placer that finds room for Organisms like theOrganism
+    def createPlacer(self, theOrganism):
+        return Placer(self.config.WORLD_SIZE, theOrganism.traits.size,
+                lambda x, y: self.clearance(theOrganism, Location(x, y)),
+                lambda: (self.rng.randint(0, self.config.WORLD_SIZE[0]), self.rng.randint(0, self.config.WORLD_SIZE[1])),
+                self.rng.shuffle,
+                lambda left, top, right, bottom: self.clearanceInBox(theOrganism, left, top, right, bottom))
+
+    # Spawn up to numberToSpawn Organisms of organismType at random free
+    # locations.  Returns the number actually spawned, which is less than
+    # numberToSpawn if the World ran out of room.
+    def spawnOrganisms(self, organismType, numberToSpawn, createWithSpawnRing):
+        placer = None
+        for i in range(numberToSpawn):
+            newOrganism = organismType(self, createWithSpawnRing)
+            if placer is None:
+                placer = self.createPlacer(newOrganism)
+            location = placer.findLocation()
+            if location is None:
+                return i
+            newOrganism.location = Location(*location)
+            self.addOrganism(newOrganism)
+            if self.tracer.spawn:
+                self.tracer.record(tracing.SPAWN, organismType.__name__, *location)
+        return numberToSpawn
+
+    # Remove the Organisms that died this turn from the organism array.  Each one
+    # is replaced by the last Organism in the array, so this costs O(1) per death
+    # instead of a copy of the whole array.  The Animals keep their turn order, so
+    # the much shorter list of them is filtered instead.
+    def purgeDeadOrganisms(self):
+        organisms = self.organisms
+        animalDied = False
+        for theOrganism in self.deadOrganisms:
+            lastOrganism = organisms.pop()
+            if lastOrganism is not theOrganism:
+                organisms[theOrganism.index] = lastOrganism
+                lastOrganism.index = theOrganism.index
+            theOrganism.index = None
+            if isinstance(theOrganism, Animal):
+                animalDied = True
+        if animalDied:
+            self.animals = [theAnimal for theAnimal in self.animals if theAnimal.isAlive]
+        self.deadOrganisms.clear()
+
+    # Returns the number of living organisms of the given type in the World
+    def countOrganisms(self, organismType):
+        count = self.populations.get(organismType)
+        if count is None:
+            count = 0
+            for populationType, population in self.populations.items():
+                if issubclass(populationType, organismType):
+                    count += population
+        return count
+
+    # Returns the number of organisms of the given type born since the World was
+    # created or last reset
+    def countBirths(self, organismType):
+        return sum(births for birthType, births in self.births.items() if issubclass(birthType, organismType))
+
+    # Returns the number of organisms of the given type that have died of cause
+    # since the World was created or last reset
+    def countDeaths(self, organismType, cause):
+        return sum(deaths for (deathType, deathCause), deaths in self.deaths.items()
+                if deathCause == cause and issubclass(deathType, organismType))
+
+    # Returns how close the living Animals of the given type are to starving on
+    # average, from 0 (all just ate) to 1 (all about to starve), or None if there
+    # aren't any
+    def meanHunger(self, organismType):
+        totalHunger = 0.0
+        count = 0
+        for gridType, typeGrid in self.grids.items():
+            population = self.populations[gridType]
+            if population and issubclass(gridType, organismType):
+                # Every Organism of a type has the same timeToStarvation, so
+                # summing timeSinceLastEaten can stay out of Python bytecode
+                timeToStarvation = self.getTraits(gridType).timeToStarvation
+                totalHunger += sum(map(getTimeSinceLastEaten,
+                        itertools.chain.from_iterable(typeGrid.cells.values()))) / timeToStarvation
+                count += population
+        return totalHunger / count if count else None
+
+    # Let the Organisms due to reproduce this tick try to, and pick when each
+    # of them reproduces next
+    def reproduceDueOrganisms(self):
+        for theOrganism in self.reproductionQueue.popDue(self.tick):
+            theOrganism.reproduce()
+            theOrganism.scheduleReproduction()
+
+    # Pass one unit of time for every Organism in the World
+    def doTurn(self):
+        self.tick += 1
+        self.tracer.tick += 1
+        self.reproduceDueOrganisms()
+        # Animals born this turn are appended to the list and also get a turn
+        for theAnimal in self.animals:
+            if theAnimal.isAlive:
+                theAnimal.doTurn()
+        self.purgeDeadOrganisms()